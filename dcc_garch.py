@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""Dynamic conditional correlations (DCC-GARCH) on top of the univariate fits.
+
+`calculate_correlation_matrix` in corr_temp_gat.py builds one static
+`combined_data.corr()` per split. The engine below takes the univariate GARCH
+fits that already exist (`fit_garch_batch` or `fit_garch11_panel`),
+standardizes the returns by their conditional volatility and runs the DCC(1,1)
+recursion of Engle (2002),
+
+    Q_t = (1 - a - b) * Qbar + a * z_{t-1} z_{t-1}' + b * Q_{t-1},
+    R_t = diag(Q_t) ** -1/2 * Q_t * diag(Q_t) ** -1/2,
+
+for all N(N+1)/2 pairs at once, in blocks of dates. Only the upper triangle
+of every R_t is kept, as float32, so the T×N×N tensor takes less than half the
+memory of the dense float64 one and can be memory-mapped from disk like the
+volatility panels. `DynamicCorrelations.frame(date)` gives the correlation
+matrix of one day in the format `create_correlation_graph` expects.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+from batched_garch import _linear_recursion
+
+# Elements of the (rows, pairs) float64 blocks the recursion works on at a time
+_BLOCK_ELEMENTS = 2**22
+
+
+def standardized_residuals(prices: pd.DataFrame, conditional_volatility: pd.DataFrame, fit_results: pd.DataFrame,
+                           scale_factor: int = 100) -> pd.DataFrame:
+    """
+    Standardize the daily returns by the univariate GARCH fits.
+
+    Parameters:
+    - prices: pd.DataFrame of shape T×N, e.g. the 'Adj Close' field of a PricePanel.
+    - conditional_volatility: pd.DataFrame of unscaled GARCH volatility on the return dates.
+    - fit_results: pd.DataFrame indexed by ticker with the fitted 'mu' on rescaled returns.
+    - scale_factor: int, the factor the returns were rescaled by when fitting.
+
+    Returns:
+    - pd.DataFrame of standardized residuals for the tickers with a fit, on the dates where all of them have one.
+    """
+    tickers = conditional_volatility.columns
+    scaled_returns = prices[tickers].pct_change().iloc[1:] * scale_factor
+    mu = fit_results['mu'].reindex(tickers) if 'mu' in fit_results else 0.0
+    resids = (scaled_returns - mu) / (conditional_volatility * scale_factor)
+    return resids.dropna()
+
+
+def _correlation_blocks(z, a, b):
+    """
+    Run the DCC recursion over a (T, N) array of standardized residuals, one block of dates at a time.
+
+    Yields:
+    - (start, correlations), with correlations a (rows, N(N+1)/2) float64 array holding the upper
+      triangle, diagonal included, of R_t for t = start..start + rows - 1.
+    """
+    T, N = z.shape
+    upper_rows, upper_columns = np.triu_indices(N)
+    diagonal = np.flatnonzero(upper_rows == upper_columns)
+    qbar = (z.T @ z / T)[upper_rows, upper_columns]
+
+    # Q_{-1} and the lagged outer product of t = 0 are both Qbar, so the recursion starts at Q_0 = Qbar
+    previous = qbar
+    rows = max(1, _BLOCK_ELEMENTS // len(qbar))
+    for start in range(0, T, rows):
+        stop = min(T, start + rows)
+        lagged = z[max(start - 1, 0):stop - 1]
+        outer = lagged[:, upper_rows] * lagged[:, upper_columns]
+        if start == 0:
+            outer = np.vstack([qbar, outer])
+
+        q = _linear_recursion((1 - a - b) * qbar + a * outer, np.full(len(qbar), b), previous)
+        previous = q[-1]
+
+        scale = np.sqrt(q[:, diagonal])
+        yield start, q / (scale[:, upper_rows] * scale[:, upper_columns])
+
+
+def _dcc_loglikelihood(z, a, b):
+    # Correlation part of the Gaussian DCC log-likelihood, summed over dates
+    T, N = z.shape
+    upper_rows, upper_columns = np.triu_indices(N)
+    loglikelihood = 0.0
+    for start, packed in _correlation_blocks(z, a, b):
+        block = z[start:start + len(packed)]
+        correlations = np.empty((len(packed), N, N))
+        correlations[:, upper_rows, upper_columns] = packed
+        correlations[:, upper_columns, upper_rows] = packed
+        _, logdet = np.linalg.slogdet(correlations)
+        solved = np.linalg.solve(correlations, block[:, :, None])[:, :, 0]
+        loglikelihood -= 0.5 * (logdet.sum() + (block * solved).sum() - (block * block).sum())
+    return loglikelihood
+
+
+def fit_dcc(standardized: pd.DataFrame, starting_values=(0.02, 0.95)) -> dict:
+    """
+    Estimate the DCC(1,1) parameters by maximizing the correlation part of the Gaussian likelihood.
+
+    Each evaluation costs O(T N^3), which is comfortable for the index universe and a few dozen tickers.
+
+    Parameters:
+    - standardized: pd.DataFrame of standardized residuals without missing values.
+    - starting_values: (a, b), the starting point of the optimizer.
+
+    Returns:
+    - dict with 'a', 'b', 'loglikelihood' and 'converged'.
+    """
+    z = standardized.to_numpy(dtype=float)
+    result = minimize(
+        lambda params: -_dcc_loglikelihood(z, *params) / len(z),
+        np.asarray(starting_values, dtype=float),
+        method='SLSQP',
+        bounds=[(0.0, 1.0), (0.0, 1.0)],
+        constraints=[{'type': 'ineq', 'fun': lambda params: 0.9999 - params[0] - params[1]}],
+    )
+    a, b = result.x
+    return {'a': float(a), 'b': float(b), 'loglikelihood': float(-result.fun * len(z)), 'converged': bool(result.success)}
+
+
+class DynamicCorrelations:
+    """
+    T×N×N correlation tensor stored as the float32 upper triangle of every date.
+
+    Attributes:
+    - values: np.ndarray or np.memmap of shape (T, N(N-1)/2), float32, the correlations above the
+      diagonal in `np.triu_indices(N, k=1)` order.
+    - dates: pd.DatetimeIndex of length T.
+    - tickers: pd.Index of length N.
+    """
+
+    def __init__(self, values, dates, tickers):
+        self.values = values
+        self.dates = dates
+        self.tickers = tickers
+
+    def tensor(self, rows=slice(None)):
+        """
+        Unpack the correlation matrices of the selected dates into a dense (rows, N, N) float32 array.
+        """
+        packed = self.values[rows]
+        N = len(self.tickers)
+        upper_rows, upper_columns = np.triu_indices(N, k=1)
+        dense = np.empty(packed.shape[:-1] + (N, N), dtype=np.float32)
+        dense[..., upper_rows, upper_columns] = packed
+        dense[..., upper_columns, upper_rows] = packed
+        dense[..., np.arange(N), np.arange(N)] = 1.0
+        return dense
+
+    def frame(self, date):
+        """
+        Return the correlation matrix of one date as an N×N DataFrame, as `create_correlation_graph` expects.
+        """
+        row = self.dates.get_loc(pd.Timestamp(date))
+        return pd.DataFrame(self.tensor(row), index=self.tickers, columns=self.tickers)
+
+    def save(self, path):
+        """
+        Persist the correlations as `<path>.npy` with a `<path>.json` index sidecar.
+        """
+        values = np.lib.format.open_memmap(f"{path}.npy", mode='w+', dtype=np.float32, shape=self.values.shape)
+        values[:] = self.values
+        values.flush()
+        del values
+        with open(f"{path}.json", 'w') as f:
+            json.dump({
+                'dates': [date.isoformat() for date in self.dates],
+                'tickers': [str(ticker) for ticker in self.tickers],
+            }, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='c'):
+        """
+        Memory-map correlations written by `save`.
+        """
+        values = np.load(f"{path}.npy", mmap_mode=mmap_mode)
+        with open(f"{path}.json") as f:
+            index = json.load(f)
+        return cls(values, pd.DatetimeIndex(index['dates']), pd.Index(index['tickers']))
+
+
+def dcc_correlations(standardized: pd.DataFrame, a: float, b: float) -> DynamicCorrelations:
+    """
+    Run the DCC(1,1) recursion with given parameters and keep the packed float32 correlations.
+
+    Parameters:
+    - standardized: pd.DataFrame of standardized residuals without missing values.
+    - a, b: float, the DCC news and persistence parameters.
+
+    Returns:
+    - DynamicCorrelations holding R_t for every date of `standardized`.
+    """
+    z = standardized.to_numpy(dtype=float)
+    N = z.shape[1]
+    upper_rows, upper_columns = np.triu_indices(N)
+    off_diagonal = np.flatnonzero(upper_rows != upper_columns)
+
+    values = np.empty((len(z), len(off_diagonal)), dtype=np.float32)
+    for start, packed in _correlation_blocks(z, a, b):
+        values[start:start + len(packed)] = packed[:, off_diagonal]
+    return DynamicCorrelations(values, standardized.index, standardized.columns)
+
+
+def fit_dcc_garch(prices: pd.DataFrame, conditional_volatility: pd.DataFrame, fit_results: pd.DataFrame,
+                  scale_factor: int = 100):
+    """
+    Estimate a DCC-GARCH model from existing univariate GARCH fits and return its correlation tensor.
+
+    Parameters:
+    - prices: pd.DataFrame of shape T×N, e.g. the 'Adj Close' field of a PricePanel.
+    - conditional_volatility, fit_results: the outputs of `fit_garch_batch` or `fit_garch11_panel`.
+    - scale_factor: int, the factor the returns were rescaled by when fitting.
+
+    Returns:
+    - correlations: DynamicCorrelations on the dates where every ticker has a standardized residual.
+    - dcc_params: dict with 'a', 'b', 'loglikelihood' and 'converged'.
+    """
+    standardized = standardized_residuals(prices, conditional_volatility, fit_results, scale_factor)
+    dcc_params = fit_dcc(standardized)
+    return dcc_correlations(standardized, dcc_params['a'], dcc_params['b']), dcc_params
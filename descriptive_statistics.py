@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""Descriptive statistics and ADF tests for a whole volatility panel.
+
+`calculate_descriptive_statistics` in the notebooks is called once per ticker
+and runs pandas mean/std, scipy skew/kurtosis and a full `adfuller` with an
+autolag search every time. `calculate_descriptive_statistics_panel` computes
+the moments of all columns in one vectorized pass over the T×N panel and runs
+the ADF regressions for the tickers in a process pool. A fixed lag order can
+be passed to skip the autolag search, which otherwise fits one regression per
+candidate lag.
+"""
+
+import numpy as np
+import pandas as pd
+
+from garch_fitting import process_map
+
+STATISTICS_COLUMNS = ['Mean', 'Standard Deviation', 'Skewness', 'Kurtosis', 'ADF Statistic', 'ADF p-value']
+
+
+def panel_moments(values: np.ndarray) -> dict:
+    """
+    Compute mean, standard deviation, skewness and kurtosis of every column of a (T, N) array, ignoring NaNs.
+
+    The conventions are those of `calculate_descriptive_statistics`: sample standard deviation (ddof=1),
+    biased skewness and non-excess kurtosis as returned by scipy's `skew` and `kurtosis(fisher=False)`.
+
+    Returns:
+    - dict of np.ndarray of length N keyed by 'Mean', 'Standard Deviation', 'Skewness' and 'Kurtosis'.
+    """
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=0)
+    mean = np.where(valid, values, 0.0).sum(axis=0) / count
+
+    # Central moments from the deviations, which is more accurate than raw power sums
+    deviations = np.where(valid, values - mean, 0.0)
+    squared = deviations**2
+    m2 = squared.sum(axis=0) / count
+    m3 = (squared * deviations).sum(axis=0) / count
+    m4 = (squared**2).sum(axis=0) / count
+
+    return {
+        'Mean': mean,
+        'Standard Deviation': np.sqrt(m2 * count / (count - 1)),
+        'Skewness': m3 / m2**1.5,
+        'Kurtosis': m4 / m2**2,
+    }
+
+
+def _adf_task(task):
+    values, lags = task
+    from statsmodels.tsa.stattools import adfuller
+
+    if lags is None:
+        adf_result = adfuller(values)
+    else:
+        adf_result = adfuller(values, maxlag=lags, autolag=None)
+    return adf_result[0], adf_result[1]
+
+
+def run_adf_tests(series, lags=None, max_workers=None, threads_per_worker=1):
+    """
+    Run the Augmented Dickey-Fuller test on several series in a process pool.
+
+    Parameters:
+    - series: list of 1-D np.ndarray without missing values.
+    - lags: int, a fixed number of lagged differences for every test. By default each test selects
+      its lag order by AIC, as `adfuller` does.
+    - max_workers: int, the number of worker processes. Defaults to the number of CPUs; 1 runs in-process.
+    - threads_per_worker: int, the BLAS/OpenMP threads allowed in each worker.
+
+    Returns:
+    - list of (ADF statistic, p-value) in the order of `series`.
+    """
+    tasks = [(values, lags) for values in series]
+    return process_map(_adf_task, tasks, max_workers=max_workers, threads_per_worker=threads_per_worker)
+
+
+def calculate_descriptive_statistics_panel(volatility, adf_lags=None, max_workers: int = 1,
+                                           threads_per_worker: int = 1) -> pd.DataFrame:
+    """
+    Calculate descriptive statistics and the ADF test for every ticker of a volatility panel.
+
+    For each ticker the row equals `calculate_descriptive_statistics(series)` on the ticker's
+    series with missing values dropped (with `adf_lags=None`).
+
+    Parameters:
+    - volatility: dict of pd.Series or pd.DataFrame of shape T×N, e.g. `realized_vol_dict`.
+    - adf_lags: int, optional fixed ADF lag order, which skips the autolag search.
+    - max_workers: int, the number of worker processes for the ADF tests. Defaults to 1, in-process:
+      a handful of tests runs faster serially than through a freshly spawned pool. None uses the
+      number of CPUs.
+    - threads_per_worker: int, the BLAS/OpenMP threads allowed in each worker.
+
+    Returns:
+    - pd.DataFrame indexed by 'Ticker' with the columns of `descriptive_stats_df`: 'Mean',
+      'Standard Deviation', 'Skewness', 'Kurtosis', 'ADF Statistic' and 'ADF p-value'.
+    """
+    frame = pd.DataFrame(volatility)
+    values = frame.to_numpy(dtype=float)
+
+    statistics = panel_moments(values)
+    adf_results = run_adf_tests(
+        [column[~np.isnan(column)] for column in values.T],
+        lags=adf_lags, max_workers=max_workers, threads_per_worker=threads_per_worker,
+    )
+    statistics['ADF Statistic'] = [statistic for statistic, _ in adf_results]
+    statistics['ADF p-value'] = [p_value for _, p_value in adf_results]
+
+    descriptive_stats_df = pd.DataFrame(statistics, index=frame.columns, columns=STATISTICS_COLUMNS)
+    descriptive_stats_df.index.name = 'Ticker'
+    return descriptive_stats_df
+
+
+class RollingStatistics:
+    """
+    Descriptive statistics of every ticker on every date, held as one compact float32 array.
+
+    Attributes:
+    - values: np.ndarray of shape (T, N, 6), float32, the STATISTICS_COLUMNS of each date and ticker.
+    - dates: pd.DatetimeIndex of length T.
+    - tickers: pd.Index of length N.
+    """
+
+    def __init__(self, values, dates, tickers):
+        self.values = values
+        self.dates = dates
+        self.tickers = tickers
+
+    def frame(self, statistic):
+        """
+        Return one statistic, e.g. 'Kurtosis' or 'ADF p-value', as a T×N DataFrame.
+        """
+        return pd.DataFrame(
+            self.values[:, :, STATISTICS_COLUMNS.index(statistic)], index=self.dates, columns=self.tickers
+        )
+
+    def at(self, date):
+        """
+        Return the statistics of all tickers on one date, in the layout of `descriptive_stats_df`.
+        """
+        row = self.dates.get_indexer([pd.Timestamp(date)], method='ffill')[0]
+        statistics = pd.DataFrame(self.values[row], index=self.tickers, columns=STATISTICS_COLUMNS)
+        statistics.index.name = 'Ticker'
+        return statistics
+
+
+def rolling_descriptive_statistics(volatility, window=None, min_periods=None, adf_stride: int = 21, adf_lags=None,
+                                   max_workers=None, threads_per_worker: int = 1) -> RollingStatistics:
+    """
+    Calculate descriptive statistics over a rolling or expanding window for every ticker and date.
+
+    The moments come from running sums of the first four powers of the values, so every date costs
+    the same whatever the window length. The power sums are taken around each ticker's overall mean
+    to limit cancellation. The ADF test is only re-run every `adf_stride` dates, in parallel across
+    tickers and test dates, and its result is carried forward to the dates in between.
+
+    Parameters:
+    - volatility: dict of pd.Series or pd.DataFrame of shape T×N, e.g. `realized_vol_dict`.
+    - window: int, the rolling window length in rows. None gives an expanding window.
+    - min_periods: int, the number of valid values needed for a result. Defaults to `window`, or 21
+      for an expanding window.
+    - adf_stride: int, the number of dates between ADF tests.
+    - adf_lags: int, optional fixed ADF lag order, which skips the autolag search.
+    - max_workers: int, the number of worker processes for the ADF tests.
+    - threads_per_worker: int, the BLAS/OpenMP threads allowed in each worker.
+
+    Returns:
+    - RollingStatistics with NaN where a window holds fewer than `min_periods` values.
+    """
+    from realized_volatility import _rolling_sum
+
+    frame = pd.DataFrame(volatility)
+    values = frame.to_numpy(dtype=float)
+    T, N = values.shape
+    if min_periods is None:
+        min_periods = window if window is not None else 21
+
+    valid = ~np.isnan(values)
+    shifted = np.where(valid, values - np.nanmean(values, axis=0), 0.0)
+    powers = np.stack([valid.astype(float), shifted, shifted**2, shifted**3, shifted**4])
+
+    # Window sums of the count and the power sums: cumulative sums, or block-local rolling sums
+    if window is None:
+        sums = np.cumsum(powers, axis=1)
+    else:
+        sums = _rolling_sum(powers.transpose(1, 0, 2).reshape(T, 5 * N), window).reshape(T, 5, N).transpose(1, 0, 2)
+    count = np.rint(sums[0])
+    enough = count >= min_periods
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s1, s2, s3, s4 = sums[1:] / count
+
+        # Central moments from the raw moments of the shifted values
+        m2 = s2 - s1**2
+        m3 = s3 - 3 * s1 * s2 + 2 * s1**3
+        m4 = s4 - 4 * s1 * s3 + 6 * s1**2 * s2 - 3 * s1**4
+
+        statistics = np.full((T, N, len(STATISTICS_COLUMNS)), np.nan, dtype=np.float32)
+        statistics[:, :, 0] = np.where(enough, s1 + np.nanmean(values, axis=0), np.nan)
+        statistics[:, :, 1] = np.where(enough, np.sqrt(np.maximum(m2, 0.0) * count / (count - 1)), np.nan)
+        statistics[:, :, 2] = np.where(enough, m3 / m2**1.5, np.nan)
+        statistics[:, :, 3] = np.where(enough, m4 / m2**2, np.nan)
+
+    # ADF tests on the window ending at every stride date, for every ticker with enough data
+    tasks = []
+    for row in range(min_periods - 1, T, adf_stride):
+        start = 0 if window is None else max(0, row + 1 - window)
+        for column in np.flatnonzero(enough[row]):
+            series = values[start:row + 1, column]
+            tasks.append((row, column, series[~np.isnan(series)]))
+    adf_results = run_adf_tests([series for _, _, series in tasks], lags=adf_lags,
+                                max_workers=max_workers, threads_per_worker=threads_per_worker)
+    for (row, column, _), (statistic, p_value) in zip(tasks, adf_results):
+        statistics[row, column, 4:] = statistic, p_value
+
+    # Carry each test forward until the next one
+    adf = pd.DataFrame(statistics[:, :, 4:].reshape(T, 2 * N)).ffill()
+    statistics[:, :, 4:] = adf.to_numpy().reshape(T, N, 2)
+    statistics[~enough] = np.nan
+
+    return RollingStatistics(statistics, frame.index, frame.columns)
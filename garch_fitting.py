@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+"""Process-parallel GARCH fitting across tickers.
+
+`calculate_garch_volatility` fits `arch_model(...).fit()` for one ticker at a
+time, which makes it the slowest part of data preparation. `fit_garch_batch`
+fits every ticker in a process pool. Each worker is capped to a fixed number
+of BLAS/OpenMP threads so that N workers do not each start a thread per core,
+and each fit is isolated so that one failure is reported in the result table
+instead of aborting the batch.
+
+`GarchParameterStore` persists the fitted parameters and the tail of the
+variance recursion per ticker and model specification. With a store,
+`fit_garch_batch` seeds each optimizer from the previous fit, and
+`extend_garch_volatility` carries the recursion forward over new returns
+with the stored parameters, so a nightly update does not re-estimate fifteen
+years of history from a cold start.
+
+`sweep_garch_specs` fits GARCH, GJR-GARCH and EGARCH over a grid of lag
+orders and error distributions in the same process pool and keeps the
+specification with the lowest AIC or BIC per ticker. Its fits are cached
+per ticker under a fingerprint of the return history, so a rerun on
+unchanged data does not fit anything.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+_THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+def _limit_threads(threads_per_worker):
+    # Environment variables cover libraries that are initialised after this point;
+    # threadpoolctl, when installed, also caps pools that are already running
+    for name in _THREAD_ENV_VARS:
+        os.environ[name] = str(threads_per_worker)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(threads_per_worker)
+
+
+def garch_returns(data: pd.DataFrame, scale_factor: int = 100) -> pd.Series:
+    """
+    Return the rescaled daily returns `calculate_garch_volatility` fits the model to.
+    """
+    if 'Adj Close' not in data.columns:
+        raise ValueError("DataFrame must contain an 'Adj Close' column.")
+    return data['Adj Close'].pct_change().dropna() * scale_factor
+
+
+def _failed_fit(error):
+    return {
+        'conditional_volatility': None,
+        'resid': None,
+        'params': None,
+        'loglikelihood': np.nan,
+        'aic': np.nan,
+        'bic': np.nan,
+        'converged': False,
+        'iterations': np.nan,
+        'error': error,
+    }
+
+
+def fit_garch(scaled_returns: pd.Series, p: int = 1, q: int = 1, o: int = 0, vol: str = 'Garch',
+              dist: str = 'normal', scale_factor: int = 100, starting_values=None) -> dict:
+    """
+    Fit one GARCH-family model and collect its output, never raising.
+
+    Parameters:
+    - scaled_returns: pd.Series of returns already multiplied by `scale_factor`.
+    - p, o, q: int, the ARCH, asymmetric and GARCH lag orders passed to `arch_model`.
+    - vol: str, the volatility process, e.g. 'Garch' or 'EGarch'.
+    - dist: str, the error distribution, e.g. 'normal' or 't'.
+    - scale_factor: int, the factor the returns were rescaled by.
+    - starting_values: np.ndarray, optional starting parameters for the optimizer.
+
+    Returns:
+    - dict with 'conditional_volatility' (pd.Series, unscaled), 'resid' (pd.Series, scaled), 'params' (pd.Series), 'loglikelihood',
+      'aic', 'bic', 'converged', 'iterations' and 'error' (None unless the fit failed).
+    """
+    from arch import arch_model
+
+    try:
+        model = arch_model(scaled_returns, vol=vol, p=p, o=o, q=q, dist=dist, rescale=False)
+        model_fitted = model.fit(disp='off', starting_values=starting_values)  # Fit the model without printing output
+        optimization = model_fitted.optimization_result
+        return {
+            'conditional_volatility': model_fitted.conditional_volatility / scale_factor,
+            'resid': model_fitted.resid,
+            'params': model_fitted.params,
+            'loglikelihood': model_fitted.loglikelihood,
+            'aic': model_fitted.aic,
+            'bic': model_fitted.bic,
+            'converged': model_fitted.convergence_flag == 0,
+            'iterations': getattr(optimization, 'nit', np.nan),
+            'error': None,
+        }
+    except Exception as e:
+        return _failed_fit(f"{type(e).__name__}: {e}")
+
+
+def _fit_garch_task(task):
+    ticker, scaled_returns, kwargs = task
+    return ticker, fit_garch(scaled_returns, **kwargs)
+
+
+def process_map(function, tasks, max_workers=None, threads_per_worker=1, start_method='spawn'):
+    """
+    Apply a picklable module-level `function` to every task in a process pool with capped BLAS threads.
+
+    Workers are started with the 'spawn' method by default so the thread caps are in place
+    before NumPy and the BLAS library load in them; 'fork' lets functions defined in a notebook
+    be used. When the resolved worker count, `min(max_workers or os.cpu_count(), len(tasks))`, is one
+    the calls run in-process, since starting a pool would only add its start-up cost.
+
+    Returns:
+    - list of results in the order of `tasks`.
+    """
+    tasks = list(tasks)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    if max_workers <= 1:
+        return [function(task) for task in tasks]
+
+    # Children inherit the environment at start-up, so set the caps before creating the pool
+    saved = {name: os.environ.get(name) for name in _THREAD_ENV_VARS}
+    for name in _THREAD_ENV_VARS:
+        os.environ[name] = str(threads_per_worker)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(start_method),
+                                 initializer=_limit_threads, initargs=(threads_per_worker,)) as executor:
+            return list(executor.map(function, tasks))
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def run_garch_tasks(tasks, max_workers=None, threads_per_worker=1):
+    """
+    Run `fit_garch` for a list of (key, scaled_returns, kwargs) tasks in a process pool.
+
+    Returns:
+    - list of (key, result dict) in the order of `tasks`.
+    """
+    return process_map(_fit_garch_task, tasks, max_workers=max_workers, threads_per_worker=threads_per_worker)
+
+
+def _results_table(results):
+    # One row per fit with the parameters spread into columns next to the diagnostics
+    rows = {}
+    for key, result in results:
+        row = {name: result[name] for name in ('loglikelihood', 'aic', 'bic', 'converged', 'iterations', 'error')}
+        if result['params'] is not None:
+            row.update(result['params'].to_dict())
+        rows[key] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def fit_garch_batch(stock_data, p: int = 1, q: int = 1, scale_factor: int = 100, max_workers=None,
+                    threads_per_worker: int = 1, parameter_store=None, **model_kwargs):
+    """
+    Fit a GARCH(p, q) model to every ticker concurrently in a process pool.
+
+    For each ticker the conditional volatility equals `calculate_garch_volatility(data, p, q, scale_factor)`.
+
+    Parameters:
+    - stock_data: dict of pd.DataFrame with an 'Adj Close' column for each ticker.
+    - p: int, the lag order for the ARCH component.
+    - q: int, the lag order for the GARCH component.
+    - scale_factor: int, factor to rescale the returns to a better range for model fitting.
+    - max_workers: int, the number of worker processes. Defaults to the number of CPUs.
+    - threads_per_worker: int, the BLAS/OpenMP threads allowed in each worker.
+    - parameter_store: GarchParameterStore, optional. When given, each fit starts from the parameters
+      stored for the ticker and specification, and the new fits are saved back to it.
+    - model_kwargs: further arguments for `fit_garch`, e.g. vol='EGarch' or dist='t'.
+
+    Returns:
+    - conditional_volatility: pd.DataFrame with one column of GARCH volatility per successfully fitted ticker.
+    - fit_results: pd.DataFrame indexed by ticker with the parameters, log-likelihood, AIC, BIC,
+      convergence flag, iteration count and error message of every fit.
+    """
+    spec = garch_spec(p=p, q=q, scale_factor=scale_factor, **model_kwargs)
+
+    tasks = []
+    errors = []
+    for ticker, data in stock_data.items():
+        try:
+            kwargs = dict(p=p, q=q, scale_factor=scale_factor, **model_kwargs)
+            if parameter_store is not None:
+                kwargs['starting_values'] = parameter_store.starting_values(ticker, spec)
+            tasks.append((ticker, garch_returns(data, scale_factor), kwargs))
+        except ValueError as e:
+            errors.append((ticker, _failed_fit(str(e))))
+
+    results = run_garch_tasks(tasks, max_workers=max_workers, threads_per_worker=threads_per_worker) + errors
+
+    if parameter_store is not None:
+        for ticker, result in results:
+            if result['error'] is None:
+                parameter_store.record_fit(ticker, spec, result)
+        parameter_store.save()
+
+    for ticker, result in results:
+        if result['error'] is not None:
+            print(f"Error for {ticker}: {result['error']}")
+    conditional_volatility = pd.DataFrame({
+        ticker: result['conditional_volatility'] for ticker, result in results if result['error'] is None
+    })
+
+    fit_results = _results_table(results).reindex([ticker for ticker in stock_data])
+    return conditional_volatility, fit_results
+
+
+def garch_spec(p: int = 1, q: int = 1, o: int = 0, vol: str = 'Garch', dist: str = 'normal',
+               scale_factor: int = 100, **kwargs) -> str:
+    """
+    Return the key identifying a model specification in a GarchParameterStore, e.g. 'Garch(p=1,o=0,q=1)-normal-x100'.
+    """
+    return f"{vol}(p={p},o={o},q={q})-{dist}-x{scale_factor}"
+
+
+def _parse_spec(spec):
+    # Inverse of garch_spec for the parts the variance recursion needs
+    vol, rest = spec.split('(', 1)
+    orders = dict(part.split('=') for part in rest.split(')', 1)[0].split(','))
+    scale_factor = float(spec.rsplit('-x', 1)[1])
+    return vol, int(orders['p']), int(orders['o']), int(orders['q']), scale_factor
+
+
+class GarchParameterStore:
+    """
+    JSON file of fitted GARCH parameters and recursion state per ticker and specification.
+
+    For each (ticker, spec) it keeps the parameter names and values, the date of
+    the last return used, and the last residuals and conditional variances
+    (on the rescaled returns) needed to continue the variance recursion.
+
+    Parameters:
+    - path: str, the JSON file to read from and write to.
+    """
+
+    def __init__(self, path='garch_params.json'):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump(self.entries, f, indent=1)
+
+    def get(self, ticker, spec):
+        return self.entries.get(spec, {}).get(ticker)
+
+    def starting_values(self, ticker, spec):
+        """
+        Return the stored parameters as an optimizer starting point, or None if there are none.
+        """
+        entry = self.get(ticker, spec)
+        return None if entry is None else np.array(entry['params'])
+
+    def record_fit(self, ticker, spec, result):
+        """
+        Store the parameters and the recursion tail of a successful `fit_garch` result.
+        """
+        _, p, o, q, scale_factor = _parse_spec(spec)
+        variances = (result['conditional_volatility'] * scale_factor) ** 2
+        self._record(ticker, spec, {
+            'param_names': list(result['params'].index),
+            'params': [float(value) for value in result['params']],
+            'last_date': str(result['resid'].index[-1]),
+            'resids': [float(value) for value in result['resid'].to_numpy()[-max(p, o, 1):]],
+            'variances': [float(value) for value in variances.to_numpy()[-max(q, 1):]],
+            'loglikelihood': float(result['loglikelihood']),
+        })
+
+    def _record(self, ticker, spec, entry):
+        self.entries.setdefault(spec, {})[ticker] = entry
+
+
+def _extend_variance(params, resids, variances, new_returns, p, o, q):
+    """
+    Continue the GARCH/GJR-GARCH variance recursion of one series over new rescaled returns.
+
+    Returns:
+    - (new_variances, resids, variances) with the state lists extended by the new observations.
+    """
+    mu = params.get('mu', 0.0)
+    new_variances = []
+    for value in new_returns:
+        variance = params['omega']
+        for i in range(1, p + 1):
+            variance += params[f'alpha[{i}]'] * resids[-i] ** 2
+        for i in range(1, o + 1):
+            variance += params[f'gamma[{i}]'] * resids[-i] ** 2 * (resids[-i] < 0)
+        for i in range(1, q + 1):
+            variance += params[f'beta[{i}]'] * variances[-i]
+        new_variances.append(variance)
+        variances.append(variance)
+        resids.append(value - mu)
+    return new_variances, resids, variances
+
+
+def extend_garch_volatility(stock_data, parameter_store, p: int = 1, q: int = 1, o: int = 0,
+                            scale_factor: int = 100, dist: str = 'normal') -> pd.DataFrame:
+    """
+    Extend stored GARCH fits over the returns that arrived since they were fitted, without refitting.
+
+    Only the variance recursion is run, over the new returns alone, with the parameters held in
+    `parameter_store`; the store's recursion state is advanced and saved. Combine it with a periodic
+    warm-started `fit_garch_batch(..., parameter_store=store)` to refresh the parameters.
+
+    Parameters:
+    - stock_data: dict of pd.DataFrame with an 'Adj Close' column for each ticker.
+    - parameter_store: GarchParameterStore holding previous fits of the same specification.
+    - p, q, o: int, the ARCH, GARCH and asymmetric lag orders of the 'Garch' volatility process.
+    - scale_factor: int, factor the returns were rescaled by when fitting.
+    - dist: str, the error distribution of the stored fits.
+
+    Returns:
+    - pd.DataFrame with the GARCH volatility of each ticker on the new dates only. Tickers without
+      a stored fit are left out.
+    """
+    spec = garch_spec(p=p, q=q, o=o, vol='Garch', dist=dist, scale_factor=scale_factor)
+
+    new_volatility = {}
+    for ticker, data in stock_data.items():
+        entry = parameter_store.get(ticker, spec)
+        if entry is None:
+            print(f"No stored GARCH fit for {ticker}; fit it with fit_garch_batch first")
+            continue
+
+        scaled_returns = garch_returns(data, scale_factor)
+        new_returns = scaled_returns[scaled_returns.index > pd.Timestamp(entry['last_date'])]
+        if new_returns.empty:
+            continue
+
+        params = dict(zip(entry['param_names'], entry['params']))
+        new_variances, resids, variances = _extend_variance(
+            params, list(entry['resids']), list(entry['variances']), new_returns.to_numpy(), p, o, q
+        )
+        new_volatility[ticker] = pd.Series(np.sqrt(new_variances) / scale_factor, index=new_returns.index)
+
+        parameter_store._record(ticker, spec, dict(
+            entry,
+            last_date=str(new_returns.index[-1]),
+            resids=resids[-max(p, o, 1):],
+            variances=variances[-max(q, 1):],
+        ))
+
+    parameter_store.save()
+    return pd.DataFrame(new_volatility)
+
+
+# Model families of the specification sweep as (vol, o) arguments of `arch_model`
+SWEEP_MODELS = {
+    'GARCH': ('Garch', 0),
+    'GJR': ('Garch', 1),
+    'EGARCH': ('EGarch', 1),
+}
+
+
+def _returns_fingerprint(scaled_returns):
+    # Changes whenever a return or a date of the history changes
+    digest = hashlib.sha1(scaled_returns.to_numpy(dtype=float).tobytes())
+    digest.update(scaled_returns.index.to_numpy(dtype='datetime64[ns]').tobytes())
+    return digest.hexdigest()
+
+
+def _load_sweep_cache(path, fingerprint):
+    # Cached fits of one ticker as {spec: (row, volatility)}, empty if missing or for another history
+    if not os.path.exists(path):
+        return {}
+    with np.load(path) as cache:
+        if str(cache['fingerprint']) != fingerprint:
+            return {}
+        rows = json.loads(str(cache['rows']))
+        volatility = cache['volatility']
+    return {spec: (row, volatility[i]) for i, (spec, row) in enumerate(rows.items())}
+
+
+def _save_sweep_cache(path, fingerprint, fits):
+    rows = {spec: row for spec, (row, _) in fits.items()}
+    np.savez(
+        path,
+        fingerprint=fingerprint,
+        rows=json.dumps(rows),
+        volatility=np.stack([volatility for _, volatility in fits.values()]),
+    )
+
+
+def sweep_garch_specs(stock_data, models=('GARCH', 'GJR', 'EGARCH'), orders=((1, 1), (1, 2), (2, 1), (2, 2)),
+                      dists=('normal', 't'), criterion: str = 'bic', scale_factor: int = 100, max_workers=None,
+                      threads_per_worker: int = 1, cache_dir=None):
+    """
+    Fit a grid of GARCH-family specifications to every ticker in parallel and select the best one per ticker.
+
+    Every (model, (p, q), dist) combination is fitted to every ticker in one process pool. For each ticker
+    the converged fit with the lowest information criterion wins; a fit that did not converge is chosen
+    only when none did.
+
+    Parameters:
+    - stock_data: dict of pd.DataFrame with an 'Adj Close' column for each ticker.
+    - models: iterable of str, keys of SWEEP_MODELS: 'GARCH', 'GJR' (GARCH with o=1) and 'EGARCH' (o=1).
+    - orders: iterable of (p, q) lag orders.
+    - dists: iterable of str, error distributions accepted by `arch_model`, e.g. 'normal', 't' or 'skewt'.
+    - criterion: str, 'aic' or 'bic'.
+    - scale_factor: int, factor to rescale the returns to a better range for model fitting.
+    - max_workers: int, the number of worker processes. Defaults to the number of CPUs.
+    - threads_per_worker: int, the BLAS/OpenMP threads allowed in each worker.
+    - cache_dir: str, optional directory of per-ticker `.npz` caches. A ticker whose returns are unchanged
+      since the cache was written reuses its cached fits, and only specifications missing from the cache
+      are fitted.
+
+    Returns:
+    - conditional_volatility: pd.DataFrame with the volatility of the selected specification of each ticker.
+    - fit_results: pd.DataFrame indexed by (ticker, spec) with the parameters, log-likelihood, AIC, BIC,
+      convergence flag and error message of every fit, and a 'selected' column marking the winners.
+    """
+    if criterion not in ('aic', 'bic'):
+        raise ValueError("criterion must be 'aic' or 'bic'.")
+
+    grid = {}
+    for model in models:
+        vol, o = SWEEP_MODELS[model]
+        for p, q in orders:
+            for dist in dists:
+                kwargs = dict(p=p, o=o, q=q, vol=vol, dist=dist, scale_factor=scale_factor)
+                grid[garch_spec(**kwargs)] = kwargs
+
+    # Collect the fits each ticker still needs, reusing cached ones for an unchanged history
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    fits = {}
+    cache_paths = {}
+    fingerprints = {}
+    return_dates = {}
+    tasks = []
+    for ticker, data in stock_data.items():
+        try:
+            scaled_returns = garch_returns(data, scale_factor)
+        except ValueError as e:
+            print(f"Error for {ticker}: {e}")
+            continue
+        fits[ticker] = {}
+        return_dates[ticker] = scaled_returns.index
+        if cache_dir is not None:
+            cache_paths[ticker] = os.path.join(cache_dir, f"{quote(str(ticker), safe='')}.npz")
+            fingerprints[ticker] = _returns_fingerprint(scaled_returns)
+            fits[ticker] = _load_sweep_cache(cache_paths[ticker], fingerprints[ticker])
+        for spec, kwargs in grid.items():
+            if spec not in fits[ticker]:
+                tasks.append(((ticker, spec), scaled_returns, kwargs))
+
+    for (ticker, spec), result in run_garch_tasks(tasks, max_workers=max_workers, threads_per_worker=threads_per_worker):
+        row = {name: result[name] for name in ('loglikelihood', 'aic', 'bic', 'converged', 'iterations', 'error')}
+        row['converged'] = bool(row['converged'])
+        if result['params'] is not None:
+            row.update(result['params'].to_dict())
+        if result['error'] is None:
+            volatility = result['conditional_volatility'].to_numpy()
+        else:
+            volatility = np.full(len(return_dates[ticker]), np.nan)
+        fits[ticker][spec] = (row, volatility)
+
+    if cache_dir is not None:
+        for ticker in fits:
+            _save_sweep_cache(cache_paths[ticker], fingerprints[ticker], fits[ticker])
+
+    # Pick the winning specification of each ticker within the requested grid
+    conditional_volatility = {}
+    rows = {}
+    for ticker, ticker_fits in fits.items():
+        candidates = [
+            (not row['converged'], row[criterion], spec)
+            for spec, (row, _) in ticker_fits.items()
+            if spec in grid and row['error'] is None
+        ]
+        winner = min(candidates)[2] if candidates else None
+        if winner is not None:
+            conditional_volatility[ticker] = pd.Series(ticker_fits[winner][1], index=return_dates[ticker])
+        else:
+            print(f"Error for {ticker}: no specification could be fitted")
+        for spec in grid:
+            rows[(ticker, spec)] = dict(ticker_fits[spec][0], selected=spec == winner)
+
+    fit_results = pd.DataFrame.from_dict(rows, orient='index')
+    fit_results.index.names = ['ticker', 'spec']
+    return pd.DataFrame(conditional_volatility), fit_results
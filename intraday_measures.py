@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Daily realized measures from local intraday bar files.
+
+`calculate_realized_volatility` can only approximate realized volatility from
+daily closes. `calculate_intraday_realized_measures` streams local 1-min or
+5-min bars, one trading day at a time, and aggregates per ticker and day:
+
+- realized variance      RV = sum of squared intraday log returns
+- bipower variation      BV = (pi / 2) * sum of |r_i| * |r_{i-1}|
+- jump component         J  = max(RV - BV, 0)
+
+The bars are expected in a Parquet dataset partitioned by day,
+`<root>/date=YYYY-MM-DD/*.parquet`, with a timestamp, a ticker and a price
+column. Only one day is held in memory at a time, so years of minute bars can
+be processed on a laptop. The output is one T×N DataFrame per measure, the
+same daily panel format the spillover and GAT stages consume; it can be
+persisted with `volatility_store.save_volatility_panel`.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+
+def _day_measures(day, ticker_column, timestamp_column, price_column, sampling):
+    """
+    Compute realized variance and bipower variation for every ticker in one day of bars.
+
+    Returns:
+    - (tickers, realized_variance, bipower_variation), the last two as arrays aligned with `tickers`.
+    """
+    day = day.sort_values([ticker_column, timestamp_column], kind='stable')
+    codes, tickers = pd.factorize(day[ticker_column], sort=False)
+    timestamps = pd.to_datetime(day[timestamp_column]).to_numpy()
+    prices = day[price_column].to_numpy(dtype=float)
+
+    if sampling is not None:
+        # Keep the last bar of each (ticker, sampling interval), e.g. 5-minute returns from 1-minute bars
+        buckets = pd.DatetimeIndex(timestamps).floor(sampling).to_numpy()
+        is_last = np.ones(len(codes), dtype=bool)
+        is_last[:-1] = (codes[1:] != codes[:-1]) | (buckets[1:] != buckets[:-1])
+        codes, prices = codes[is_last], prices[is_last]
+
+    # Intraday log returns, dropping the ones that would span two tickers
+    log_prices = np.log(prices)
+    same_ticker = codes[1:] == codes[:-1]
+    returns = (log_prices[1:] - log_prices[:-1])[same_ticker]
+    return_codes = codes[1:][same_ticker]
+
+    realized_variance = np.bincount(return_codes, weights=returns**2, minlength=len(tickers))
+
+    # Products of consecutive absolute returns of the same ticker
+    abs_returns = np.abs(returns)
+    consecutive = return_codes[1:] == return_codes[:-1]
+    bipower_variation = (np.pi / 2) * np.bincount(
+        return_codes[1:][consecutive],
+        weights=(abs_returns[1:] * abs_returns[:-1])[consecutive],
+        minlength=len(tickers),
+    )
+
+    return list(tickers), realized_variance, bipower_variation
+
+
+def calculate_intraday_realized_measures(root, start=None, end=None, ticker_column='ticker',
+                                         timestamp_column='timestamp', price_column='close', sampling=None) -> dict:
+    """
+    Aggregate daily realized measures from intraday bars, streaming one day at a time.
+
+    Parameters:
+    - root: str, the directory of the Parquet dataset partitioned by 'date=YYYY-MM-DD'.
+    - start, end: str, optional first and last day to process (inclusive); other days are never read.
+    - ticker_column, timestamp_column, price_column: str, the column names in the bar files.
+    - sampling: str, optional pandas frequency such as '5min' to sample the bars at before computing returns.
+
+    Returns:
+    - dict of T×N pd.DataFrame with a DateTimeIndex and one column per ticker:
+      'realized_variance', 'bipower_variation', 'jump', 'continuous_variance' and 'realized_volatility'.
+    """
+    partitioning = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+    dataset = ds.dataset(root, format='parquet', partitioning=partitioning)
+
+    # Group the files by trading day from their partition keys without reading any data
+    fragments_by_day = defaultdict(list)
+    for fragment in dataset.get_fragments():
+        day = ds.get_partition_keys(fragment.partition_expression)['date']
+        if (start is None or day >= start) and (end is None or day <= end):
+            fragments_by_day[day].append(fragment)
+
+    columns = [ticker_column, timestamp_column, price_column]
+    ticker_positions = {}
+    days, rows = [], []
+    for day in sorted(fragments_by_day):
+        bars = pa.concat_tables(fragment.to_table(columns=columns) for fragment in fragments_by_day[day]).to_pandas()
+        tickers, realized_variance, bipower_variation = _day_measures(
+            bars, ticker_column, timestamp_column, price_column, sampling
+        )
+        for ticker in tickers:
+            ticker_positions.setdefault(ticker, len(ticker_positions))
+        days.append(pd.Timestamp(day))
+        rows.append(([ticker_positions[ticker] for ticker in tickers], realized_variance, bipower_variation))
+
+    # Assemble the daily panels; tickers without bars on a day are NaN
+    shape = (len(days), len(ticker_positions))
+    realized_variance = np.full(shape, np.nan)
+    bipower_variation = np.full(shape, np.nan)
+    for i, (positions, day_rv, day_bv) in enumerate(rows):
+        realized_variance[i, positions] = day_rv
+        bipower_variation[i, positions] = day_bv
+
+    jump = np.maximum(realized_variance - bipower_variation, 0.0)
+    index = pd.DatetimeIndex(days)
+    columns = list(ticker_positions)
+    return {
+        'realized_variance': pd.DataFrame(realized_variance, index=index, columns=columns),
+        'bipower_variation': pd.DataFrame(bipower_variation, index=index, columns=columns),
+        'jump': pd.DataFrame(jump, index=index, columns=columns),
+        'continuous_variance': pd.DataFrame(realized_variance - jump, index=index, columns=columns),
+        'realized_volatility': pd.DataFrame(np.sqrt(realized_variance), index=index, columns=columns),
+    }
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Chronological train/validation/test splits as row boundaries over the aligned panel.
+
+The notebooks called sklearn's `train_test_split` twice per ticker on
+reset-index DataFrames, which copied every ticker's series into three new
+frames. `split_panel` computes the split once for all tickers and stores only
+the row boundaries of each part. Arrays, DataFrames, per-ticker Series and
+torch tensors of a part are handed out as views of the panel, which may itself
+be memory-mapped, so splitting costs no memory.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+SPLIT_NAMES = ('train', 'validation', 'test')
+
+
+class PanelSplit:
+    """
+    Row boundaries of the parts of a T×N panel, with views of each part on request.
+
+    Attributes:
+    - values: np.ndarray or np.memmap of shape (T, N), the panel.
+    - dates: pd.DatetimeIndex of length T.
+    - tickers: pd.Index of length N.
+    - boundaries: dict mapping each part name to its (start, stop) rows.
+    """
+
+    def __init__(self, values, dates, tickers, boundaries):
+        self.values = values
+        self.dates = dates
+        self.tickers = tickers
+        self.boundaries = boundaries
+
+    def rows(self, name):
+        return slice(*self.boundaries[name])
+
+    def sizes(self):
+        """
+        Return the number of rows of every part.
+        """
+        return {name: stop - start for name, (start, stop) in self.boundaries.items()}
+
+    def index(self, name):
+        """
+        Return the dates of one part.
+        """
+        return self.dates[self.rows(name)]
+
+    def array(self, name):
+        """
+        Return one part as a (rows, N) NumPy view of the panel.
+        """
+        return self.values[self.rows(name)]
+
+    def frame(self, name):
+        """
+        Return one part as a DataFrame sharing memory with the panel.
+        """
+        return pd.DataFrame(self.array(name), index=self.index(name), columns=self.tickers, copy=False)
+
+    def series_dict(self, name):
+        """
+        Return one part as the dictionary of per-ticker pd.Series the notebooks use, without copying.
+        """
+        block = self.array(name)
+        index = self.index(name)
+        return {ticker: pd.Series(block[:, i], index=index, name=ticker, copy=False) for i, ticker in enumerate(self.tickers)}
+
+    def tensor(self, name, tickers=None):
+        """
+        Return one part as a torch tensor.
+
+        Parameters:
+        - name: str, the part, e.g. 'train'.
+        - tickers: list of str, the columns in the order wanted. Defaults to all tickers in panel order.
+
+        Returns:
+        - torch.Tensor of shape (rows, tickers). With the tickers in panel order it is a view of the
+          panel; reordering them costs a single gather.
+        """
+        import torch
+
+        block = self.array(name)
+        if tickers is not None and list(tickers) != list(self.tickers):
+            block = block[:, self.tickers.get_indexer(tickers)]
+        return torch.from_numpy(block)
+
+
+def split_panel(panel, test_size: float = 0.5, holdout_test_size: float = 0.6) -> PanelSplit:
+    """
+    Split a panel chronologically into train, validation and test parts, once for all tickers.
+
+    The sizes follow the two calls the notebooks made per ticker,
+    `train_test_split(df, test_size=test_size, shuffle=False)` and then
+    `train_test_split(temp_data, test_size=holdout_test_size, shuffle=False)` on the held-out part,
+    i.e. 50/20/30 by default.
+
+    Parameters:
+    - panel: VolatilityPanel, pd.DataFrame of shape T×N, or dict of pd.Series.
+    - test_size: float, the share of rows held out from training.
+    - holdout_test_size: float, the share of the held-out rows used for testing; the rest is validation.
+
+    Returns:
+    - PanelSplit over the rows from the first to the last date on which every ticker has a value,
+      which are the rows of the per-ticker series after `dropna()` for a panel with aligned dates.
+    """
+    if isinstance(panel, (dict, pd.DataFrame)):
+        frame = pd.DataFrame(panel)
+        values, dates, tickers = frame.to_numpy(), frame.index, frame.columns
+    else:
+        values, dates, tickers = panel.values, panel.dates, panel.tickers
+
+    complete = np.flatnonzero(~np.isnan(values).any(axis=1))
+    first, last = int(complete[0]), int(complete[-1]) + 1
+
+    # Same rounding as train_test_split: the test part is rounded up
+    rows = last - first
+    holdout = math.ceil(test_size * rows)
+    test = math.ceil(holdout_test_size * holdout)
+    validation_start = first + rows - holdout
+    test_start = validation_start + holdout - test
+
+    boundaries = dict(zip(SPLIT_NAMES, [(first, validation_start), (validation_start, test_start), (test_start, last)]))
+    return PanelSplit(values, dates, tickers, boundaries)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Aligned T×N price panel with a packed fill-mask.
+
+The notebooks reindex every ticker to the business-day calendar and
+forward/backward-fill it on its own, then count the filled days by comparing
+`notna()` counts per DataFrame. `build_price_panel` does the same alignment for
+the whole universe in one vectorized pass over a (fields × dates × tickers)
+array and keeps a bit-packed mask of the cells that were filled, so later
+stages can skip or down-weight stale prices without recomputing anything.
+"""
+
+import numpy as np
+import pandas as pd
+
+from price_sources import _business_days
+
+
+def _ffill_bfill(values):
+    """
+    Forward-fill then backward-fill NaNs along the time axis (axis 1) of a (F, T, N) array.
+    """
+    T = values.shape[1]
+    valid = ~np.isnan(values)
+    time_index = np.arange(T).reshape(1, T, 1)
+
+    # Forward fill: index of the last valid observation at or before each date
+    last_valid = np.maximum.accumulate(np.where(valid, time_index, 0), axis=1)
+    values = np.take_along_axis(values, last_valid, axis=1)
+
+    # Backward fill: the cells still missing precede the first valid observation
+    first_valid = np.argmax(valid, axis=1)[:, np.newaxis, :]
+    leading = np.isnan(values)
+    return np.where(leading, np.take_along_axis(values, first_valid, axis=1), values)
+
+
+class PricePanel:
+    """
+    Prices for many tickers aligned on one business-day calendar.
+
+    Attributes:
+    - dates: pd.DatetimeIndex of length T.
+    - tickers: pd.Index of length N.
+    - fields: list of str, the price fields, e.g. ['Open', ..., 'Adj Close', 'Volume'].
+    - values: np.ndarray of shape (F, T, N) with the filled prices.
+    - packed_mask: np.ndarray of uint8, the filled cells bit-packed along the ticker axis.
+    """
+
+    def __init__(self, dates, tickers, fields, values, packed_mask):
+        self.dates = dates
+        self.tickers = tickers
+        self.fields = list(fields)
+        self.values = values
+        self.packed_mask = packed_mask
+
+    def field(self, name):
+        """
+        Return one price field as a T×N DataFrame without copying the underlying array.
+        """
+        return pd.DataFrame(self.values[self.fields.index(name)], index=self.dates, columns=self.tickers, copy=False)
+
+    def filled_mask(self, name):
+        """
+        Return a T×N boolean array that is True where the field was forward- or backward-filled.
+        """
+        packed = self.packed_mask[self.fields.index(name)]
+        return np.unpackbits(packed, axis=-1, count=len(self.tickers)).astype(bool)
+
+    def filled_days_counts(self):
+        """
+        Return the number of filled values per field (rows) and ticker (columns).
+        """
+        counts = [self.filled_mask(name).sum(axis=0) for name in self.fields]
+        return pd.DataFrame(counts, index=self.fields, columns=self.tickers)
+
+    def to_stock_data(self):
+        """
+        Return the panel as the dictionary of per-ticker DataFrames used by the notebooks.
+        """
+        return {
+            ticker: pd.DataFrame(self.values[:, :, j].T, index=self.dates, columns=self.fields)
+            for j, ticker in enumerate(self.tickers)
+        }
+
+
+def build_price_panel(prices, start, end, tickers=None, fields=None):
+    """
+    Align long-format daily bars on the business-day calendar and fill missing days.
+
+    Parameters:
+    - prices: pd.DataFrame with 'Date' and 'Ticker' columns plus one column per price field,
+      e.g. the output of `PriceStore.read`.
+    - start, end: str or datetime, the bounds of the business-day range.
+    - tickers: list of str, the tickers and their order in the panel. Defaults to the tickers in `prices`.
+    - fields: list of str, the price fields to keep. Defaults to every other column.
+
+    Returns:
+    - PricePanel with the filled values and the mask of filled cells.
+    """
+    if fields is None:
+        fields = [column for column in prices.columns if column not in ('Date', 'Ticker')]
+    if tickers is None:
+        tickers = pd.unique(prices['Ticker'])
+    else:
+        present = set(prices['Ticker'].unique())
+        tickers = [ticker for ticker in tickers if ticker in present]
+    dates = _business_days(start, end)
+    tickers = pd.Index(tickers)
+
+    # Scatter every bar into its (date, ticker) cell; bars outside the calendar are dropped
+    rows = dates.get_indexer(pd.to_datetime(prices['Date']))
+    columns = tickers.get_indexer(prices['Ticker'])
+    keep = (rows >= 0) & (columns >= 0)
+
+    values = np.full((len(fields), len(dates), len(tickers)), np.nan)
+    values[:, rows[keep], columns[keep]] = prices.loc[keep, fields].to_numpy(dtype=float).T
+
+    # Fill the gaps and record which cells were filled
+    missing = np.isnan(values)
+    values = _ffill_bfill(values)
+    filled = missing & ~np.isnan(values)
+
+    return PricePanel(dates, tickers, fields, values, np.packbits(filled, axis=-1))
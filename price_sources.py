@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""Price sources and concurrent multi-ticker ingestion.
+
+Every notebook used to call `fetch_and_fill_data` once per ticker in a serial
+loop, i.e. one `yf.download` round trip after another. The helpers below put a
+small provider interface in front of the download so the same ingestion code
+can run against Yahoo Finance, the CSV files written by earlier runs, or a
+synthetic generator for offline benchmarks and tests.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+@lru_cache(maxsize=32)
+def _business_days(start, end):
+    # Building a business-day range is surprisingly slow, and every symbol in a
+    # batch shares the same one
+    return pd.date_range(start=start, end=end, freq='B')  # 'B' frequency is for business days
+
+
+class PriceSource(ABC):
+    """
+    Interface for anything that can return daily OHLCV bars for a symbol.
+
+    Subclasses implement `download(symbol, start, end)` and return a
+    pd.DataFrame indexed by date with the same columns `yf.download` produces
+    ('Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume'). As with
+    `yf.download`, `end` is exclusive.
+    """
+
+    @abstractmethod
+    def download(self, symbol, start, end):
+        """
+        Return the daily bars of one symbol in [start, end) as a pd.DataFrame indexed by date.
+        """
+
+    def download_many(self, symbols, start, end, max_workers=8):
+        """
+        Download several symbols concurrently.
+
+        Parameters:
+        - symbols: list of str, the tickers to fetch.
+        - start, end: str or datetime, the date range passed to `download`.
+        - max_workers: int, the number of threads in the pool.
+
+        Returns:
+        - dict mapping each symbol to its pd.DataFrame, or to the exception raised while fetching it.
+        """
+        def _download(symbol):
+            try:
+                return self.download(symbol, start, end)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(_download, symbols)
+        return dict(zip(symbols, results))
+
+
+class YFinanceSource(PriceSource):
+    """
+    Price source backed by Yahoo Finance via `yfinance`.
+    """
+
+    def __init__(self, **download_kwargs):
+        self.download_kwargs = download_kwargs
+
+    @staticmethod
+    def _flatten(data, symbol):
+        # Newer yfinance versions return (field, ticker) MultiIndex columns, older ones
+        # and single-symbol downloads flat field columns
+        if isinstance(data.columns, pd.MultiIndex):
+            data = data.xs(symbol, axis=1, level=-1)
+        return data
+
+    def download(self, symbol, start, end):
+        import yfinance as yf
+
+        data = yf.download(symbol, start=start, end=end, progress=False, **self.download_kwargs)
+        return self._flatten(data, symbol)
+
+    def download_many(self, symbols, start, end, max_workers=8):
+        import yfinance as yf
+
+        # yfinance keeps module-level state per download call, so a batched call
+        # with its own worker threads is safer than calling `download` from a pool
+        data = yf.download(list(symbols), start=start, end=end, group_by='column',
+                           threads=max_workers, progress=False, **self.download_kwargs)
+
+        results = {}
+        for symbol in symbols:
+            try:
+                # The batch is aligned on the union of all trading days, so drop the
+                # rows on which this symbol did not trade
+                symbol_data = self._flatten(data, symbol).dropna(how='all')
+                if symbol_data.empty:
+                    raise ValueError("no data returned")
+                results[symbol] = symbol_data
+            except Exception as e:
+                results[symbol] = e
+        return results
+
+
+class FileSource(PriceSource):
+    """
+    Price source that reads per-ticker CSV files from a local directory, e.g. the
+    `{ticker}_stock_data.csv` files written by the notebooks.
+    """
+
+    def __init__(self, directory='.', pattern='{symbol}_stock_data.csv'):
+        self.directory = directory
+        self.pattern = pattern
+
+    def download(self, symbol, start, end):
+        path = os.path.join(self.directory, self.pattern.format(symbol=symbol))
+        data = pd.read_csv(path, index_col=0, parse_dates=True)
+        # Match the yfinance convention of an exclusive end date
+        return data.loc[(data.index >= pd.Timestamp(start)) & (data.index < pd.Timestamp(end))]
+
+
+class SyntheticSource(PriceSource):
+    """
+    Deterministic random-walk price source for offline benchmarks and tests.
+
+    Each symbol gets its own reproducible price path, and a fraction of business
+    days is dropped at random to mimic exchange holidays. The path starts at a
+    fixed epoch and is sliced to the requested range, so a date's bar is the same
+    whatever range it is fetched in, as with a real provider.
+    """
+
+    epoch = pd.Timestamp('1970-01-01')
+
+    def __init__(self, seed=0, initial_price=100.0, daily_vol=0.01, missing_rate=0.03):
+        self.seed = seed
+        self.initial_price = initial_price
+        self.daily_vol = daily_vol
+        self.missing_rate = missing_rate
+
+    def download(self, symbol, start, end):
+        if pd.Timestamp(start) < self.epoch:
+            raise ValueError(f"SyntheticSource has no prices before {self.epoch.date()}.")
+        dates = _business_days(self.epoch, pd.Timestamp(end))
+        dates = dates[dates < pd.Timestamp(end)]
+        n = len(dates)
+
+        # One stream per field, seeded from the symbol, so results do not depend on the order of
+        # requests and the first n draws of every field do not depend on how many days follow
+        returns_rng, open_rng, high_rng, low_rng, volume_rng, holiday_rng = (
+            np.random.default_rng([self.seed, field, *symbol.encode()]) for field in range(6)
+        )
+
+        log_returns = returns_rng.normal(0.0, self.daily_vol, size=n)
+        close = self.initial_price * np.exp(np.cumsum(log_returns))
+        open_ = close * np.exp(open_rng.normal(0.0, self.daily_vol / 4, size=n))
+        high = np.maximum(open_, close) * np.exp(np.abs(high_rng.normal(0.0, self.daily_vol / 2, size=n)))
+        low = np.minimum(open_, close) * np.exp(-np.abs(low_rng.normal(0.0, self.daily_vol / 2, size=n)))
+        volume = volume_rng.integers(1_000_000, 10_000_000, size=n)
+
+        data = pd.DataFrame({
+            'Open': open_,
+            'High': high,
+            'Low': low,
+            'Close': close,
+            'Adj Close': close,
+            'Volume': volume,
+        }, index=dates)
+        data.index.name = 'Date'
+
+        keep = (holiday_rng.random(n) >= self.missing_rate) & (dates >= pd.Timestamp(start))
+        return data[keep]
+
+
+def fill_to_business_days(data, start, end):
+    """
+    Reindex fetched data to the complete business-day range and fill missing days.
+
+    Parameters:
+    - data: pd.DataFrame of daily bars as returned by a PriceSource.
+    - start, end: str or datetime, the bounds of the business-day range.
+
+    Returns:
+    - data_filled: pd.DataFrame reindexed to the full range with forward- and backward-filled values.
+    - filled_days_count: pd.Series, the number of filled values per column.
+    """
+    # Create a complete date range
+    full_range = _business_days(start, end)
+    # Reindex to the full date range and forward-fill then backward-fill the gaps
+    data_filled = data.reindex(full_range).ffill().bfill()
+    # Count how many days the values were replaced
+    filled_days_count = data_filled.notna().sum() - data.notna().sum()
+    return data_filled, filled_days_count
+
+
+def fetch_and_fill_data(symbol, start, end, source=None):
+    """
+    Fetch historical data for one symbol, reindex to the complete date range and fill missing data.
+
+    Parameters:
+    - symbol: str, the ticker to fetch.
+    - start, end: str or datetime, the date range.
+    - source: PriceSource, where to fetch from. Defaults to Yahoo Finance.
+
+    Returns:
+    - (data_filled, filled_days_count), or (None, None) if the fetch failed.
+    """
+    source = source if source is not None else YFinanceSource()
+    try:
+        data = source.download(symbol, start, end)
+        return fill_to_business_days(data, start, end)
+    except Exception as e:
+        print(f"Error fetching data for {symbol}: {e}")
+        return None, None
+
+
+def fetch_and_fill_many(symbols, start, end, source=None, max_workers=8):
+    """
+    Fetch and fill historical data for many symbols concurrently.
+
+    Parameters:
+    - symbols: list of str, the tickers to fetch.
+    - start, end: str or datetime, the date range.
+    - source: PriceSource, where to fetch from. Defaults to Yahoo Finance.
+    - max_workers: int, the number of concurrent downloads.
+
+    Returns:
+    - stock_data: dict of pd.DataFrame, the filled data for each symbol that was fetched successfully.
+    - filled_days_counts: dict of pd.Series, the number of filled values per column for each symbol.
+    """
+    source = source if source is not None else YFinanceSource()
+    downloads = source.download_many(symbols, start, end, max_workers=max_workers)
+
+    stock_data = {}
+    filled_days_counts = {}
+    for symbol in symbols:
+        data = downloads[symbol]
+        if isinstance(data, Exception):
+            print(f"Error fetching data for {symbol}: {data}")
+            continue
+        stock_data[symbol], filled_days_counts[symbol] = fill_to_business_days(data, start, end)
+
+    return stock_data, filled_days_counts
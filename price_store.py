@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""Columnar on-disk price store.
+
+Replaces the `{ticker}_stock_data.csv` dumps, which were written on every run
+and never read back. Bars are kept in a Parquet dataset partitioned by ticker
+(`<root>/Ticker=<symbol>/*.parquet`) with one row per date, so the whole
+universe can be loaded in a single columnar read with column, ticker and
+date-range pushdown.
+
+The store holds the bars exactly as the price source returned them. The
+business-day reindex and ffill/bfill are applied on load, which keeps the
+stored history independent of the date range a notebook happens to request.
+
+`PriceStore.update` implements the nightly incremental mode: it looks up the
+last stored bar of each ticker from the Parquet footers, fetches only the
+missing tail plus a small overlap, and appends it as a new file. Loads also
+check each ticker's stored first and last dates against the requested range
+and fetch the uncovered head or tail, so a gap is never silently filled flat.
+"""
+
+import os
+import shutil
+import time
+import uuid
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from price_panel import build_price_panel
+from price_sources import YFinanceSource, fill_to_business_days
+
+
+class PriceStore:
+    """
+    Parquet-backed store of daily bars keyed by ticker and date.
+
+    Parameters:
+    - root: str, the directory holding the Parquet dataset.
+    """
+
+    def __init__(self, root='price_store'):
+        self.root = root
+
+    def _partition(self, ticker):
+        # Escape the ticker so symbols such as 'BRK/B' stay a single directory;
+        # pyarrow decodes the name again when reading the hive partition
+        return os.path.join(self.root, f"Ticker={quote(ticker, safe='')}")
+
+    def tickers(self):
+        """
+        Return the list of tickers held in the store.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            unquote(name[len('Ticker='):]) for name in os.listdir(self.root)
+            if name.startswith('Ticker=') and os.listdir(os.path.join(self.root, name))
+        )
+
+    def write(self, prices):
+        """
+        Write daily bars to the store, replacing any history already stored for those tickers.
+
+        Parameters:
+        - prices: dict of pd.DataFrame, daily bars indexed by date for each ticker.
+        """
+        for ticker, data in prices.items():
+            shutil.rmtree(self._partition(ticker), ignore_errors=True)
+            self.append(ticker, data)
+
+    def append(self, ticker, data):
+        """
+        Append daily bars for a single ticker as a new file in its partition.
+
+        Parameters:
+        - ticker: str, the ticker the bars belong to.
+        - data: pd.DataFrame of daily bars indexed by date.
+        """
+        if data.empty:
+            return
+        partition = self._partition(ticker)
+        os.makedirs(partition, exist_ok=True)
+
+        table = data.copy()
+        table.index = pd.to_datetime(table.index).rename('Date')
+        # Prefix the file name with the write time so files sort in append order
+        file_name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+        table.reset_index().to_parquet(os.path.join(partition, file_name), index=False)
+
+    def date_ranges(self, tickers=None):
+        """
+        Return the dates of the first and last stored bar for each ticker.
+
+        Only the Parquet footers are read; their column statistics already hold the
+        minimum and maximum date of every file, so this costs the same for one year
+        of history as for fifteen.
+
+        Parameters:
+        - tickers: list of str, the tickers to look up. Defaults to all tickers.
+
+        Returns:
+        - dict mapping each stored ticker to a (first, last) pair of pd.Timestamp.
+        """
+        date_ranges = {}
+        for ticker in (tickers if tickers is not None else self.tickers()):
+            partition = self._partition(ticker)
+            if not os.path.isdir(partition):
+                continue
+            for name in os.listdir(partition):
+                metadata = pq.read_metadata(os.path.join(partition, name))
+                date_column = metadata.schema.names.index('Date')
+                for i in range(metadata.num_row_groups):
+                    statistics = metadata.row_group(i).column(date_column).statistics
+                    if statistics is None or not statistics.has_min_max:
+                        continue
+                    file_min, file_max = pd.Timestamp(statistics.min), pd.Timestamp(statistics.max)
+                    if ticker in date_ranges:
+                        first, last = date_ranges[ticker]
+                        file_min, file_max = min(first, file_min), max(last, file_max)
+                    date_ranges[ticker] = (file_min, file_max)
+        return date_ranges
+
+    def last_dates(self, tickers=None):
+        """
+        Return the date of the last stored bar for each ticker, from the Parquet footers.
+
+        Parameters:
+        - tickers: list of str, the tickers to look up. Defaults to all tickers.
+
+        Returns:
+        - dict mapping each stored ticker to a pd.Timestamp.
+        """
+        return {ticker: last for ticker, (_, last) in self.date_ranges(tickers).items()}
+
+    def backfill(self, tickers, start, source=None, max_workers=8):
+        """
+        Extend the stored history back to `start`, fetching only the bars before the first stored one.
+
+        Tickers that are not stored yet are left to `update`.
+
+        Parameters:
+        - tickers: list of str, the tickers to backfill.
+        - start: str or datetime, the first date the history should cover.
+        - source: PriceSource, where to fetch from. Defaults to Yahoo Finance.
+        - max_workers: int, the number of concurrent downloads.
+
+        Returns:
+        - dict mapping each ticker to the number of bars appended.
+        """
+        source = source if source is not None else YFinanceSource()
+        date_ranges = self.date_ranges(tickers)
+
+        # Group the tickers by their first stored bar so each group is one batched download
+        fetch_ends = {}
+        for ticker in tickers:
+            if ticker in date_ranges and date_ranges[ticker][0] > pd.Timestamp(start):
+                fetch_ends.setdefault(date_ranges[ticker][0], []).append(ticker)
+
+        appended = {}
+        for fetch_end, group in fetch_ends.items():
+            downloads = source.download_many(group, start, fetch_end, max_workers=max_workers)
+            for ticker, data in downloads.items():
+                if isinstance(data, Exception):
+                    print(f"Error fetching data for {ticker}: {data}")
+                    continue
+                self.append(ticker, data)
+                appended[ticker] = len(data)
+        return appended
+
+    def update(self, tickers, start, end, source=None, overlap_days=5, max_workers=8):
+        """
+        Bring the stored history up to `end`, fetching only what is missing.
+
+        Tickers that are not stored yet are fetched over the full range. For the
+        others only the bars after the last stored one are fetched, together with
+        `overlap_days` business days before it so that late revisions of recent
+        bars replace the stored values.
+
+        Parameters:
+        - tickers: list of str, the tickers to update.
+        - start, end: str or datetime, the full date range; `end` is exclusive.
+        - source: PriceSource, where to fetch from. Defaults to Yahoo Finance.
+        - overlap_days: int, the number of already stored business days to fetch again.
+        - max_workers: int, the number of concurrent downloads.
+
+        Returns:
+        - dict mapping each ticker to the number of bars appended.
+        """
+        source = source if source is not None else YFinanceSource()
+        last_dates = self.last_dates(tickers)
+
+        # Group the tickers by the first date they need so each group is one batched download
+        fetch_starts = {}
+        for ticker in tickers:
+            if ticker in last_dates:
+                fetch_start = max(last_dates[ticker] - pd.offsets.BDay(overlap_days), pd.Timestamp(start))
+            else:
+                fetch_start = pd.Timestamp(start)
+            if fetch_start < pd.Timestamp(end):
+                fetch_starts.setdefault(fetch_start, []).append(ticker)
+
+        appended = {}
+        for fetch_start, group in fetch_starts.items():
+            downloads = source.download_many(group, fetch_start, end, max_workers=max_workers)
+            for ticker, data in downloads.items():
+                if isinstance(data, Exception):
+                    print(f"Error fetching data for {ticker}: {data}")
+                    continue
+                self.append(ticker, data)
+                appended[ticker] = len(data)
+        return appended
+
+    def compact(self, tickers=None):
+        """
+        Rewrite each ticker's partition as a single file, dropping bars superseded by later appends.
+
+        Parameters:
+        - tickers: list of str, the tickers to compact. Defaults to all tickers.
+        """
+        tickers = tickers if tickers is not None else self.tickers()
+        self.write(self.load_stock_data(tickers))
+
+    def read(self, tickers=None, columns=None, start=None, end=None):
+        """
+        Read stored bars as one long DataFrame in a single columnar read.
+
+        Parameters:
+        - tickers: list of str, the tickers to load. Defaults to all tickers.
+        - columns: list of str, the price fields to load, e.g. ['Adj Close']. Defaults to all fields.
+        - start, end: str or datetime, the date range to load; `end` is exclusive.
+
+        Returns:
+        - pd.DataFrame with 'Date' and 'Ticker' columns followed by the requested fields.
+        """
+        filters = []
+        if tickers is not None:
+            filters.append(('Ticker', 'in', list(tickers)))
+        if start is not None:
+            filters.append(('Date', '>=', pd.Timestamp(start)))
+        if end is not None:
+            filters.append(('Date', '<', pd.Timestamp(end)))
+        if columns is not None:
+            columns = ['Date', 'Ticker', *columns]
+
+        data = pd.read_parquet(self.root, columns=columns, filters=filters or None)
+
+        # Sort by ticker and date on the integer codes of the partition column rather
+        # than on strings. The sort is stable and files are named in append order,
+        # so the last of several copies of a bar is the most recently appended one
+        ticker_codes = data['Ticker'].cat.codes.to_numpy()
+        dates = data['Date'].to_numpy()
+        order = np.lexsort((dates, ticker_codes))
+        ticker_codes, dates = ticker_codes[order], dates[order]
+        is_last = np.ones(len(order), dtype=bool)
+        is_last[:-1] = (ticker_codes[1:] != ticker_codes[:-1]) | (dates[1:] != dates[:-1])
+
+        data = data.iloc[order[is_last]].reset_index(drop=True)
+        data['Ticker'] = data['Ticker'].astype(str)
+        return data
+
+    def load_stock_data(self, tickers=None, columns=None, start=None, end=None):
+        """
+        Read stored bars as a dictionary of per-ticker DataFrames indexed by date.
+
+        Parameters are the same as for `read`.
+
+        Returns:
+        - dict of pd.DataFrame, the stored bars for each ticker.
+        """
+        data = self.read(tickers=tickers, columns=columns, start=start, end=end)
+        stock_data = {
+            ticker: frame.drop(columns='Ticker').set_index('Date').rename_axis(None)
+            for ticker, frame in data.groupby('Ticker', sort=False)
+        }
+        if tickers is not None:
+            stock_data = {ticker: stock_data[ticker] for ticker in tickers if ticker in stock_data}
+        return stock_data
+
+
+def _uncovered(tickers, start, end, date_ranges, slack_days):
+    # Tickers whose stored history misses the head or the tail of [start, end). A few business days
+    # of slack absorb holidays at either edge, and the tail is only required up to today
+    slack = pd.offsets.BDay(slack_days)
+    covered_end = min(pd.Timestamp(end), pd.Timestamp.today().normalize())
+    heads = [ticker for ticker in tickers if ticker in date_ranges
+             and date_ranges[ticker][0] > pd.Timestamp(start) + slack]
+    tails = [ticker for ticker in tickers if ticker in date_ranges
+             and date_ranges[ticker][1] < covered_end - slack]
+    return heads, tails
+
+
+def _ensure_stored(tickers, start, end, store, source, max_workers, update, slack_days=5):
+    # Fetch the tickers the store does not hold yet and whatever head or tail of the requested range
+    # their stored history does not cover; with `update` the missing tail of every ticker is fetched
+    date_ranges = store.date_ranges(tickers)
+    heads, tails = _uncovered(tickers, start, end, date_ranges, slack_days)
+    if heads:
+        store.backfill(heads, start, source=source, max_workers=max_workers)
+    to_fetch = [ticker for ticker in tickers if update or ticker not in date_ranges or ticker in tails]
+    if to_fetch:
+        store.update(to_fetch, start, end, source=source, max_workers=max_workers)
+
+    # The source may simply not have the bars, e.g. before a listing date. Say so, since the fill on
+    # load would otherwise turn the gap into flat prices and zero volatility without a trace
+    if heads or tails:
+        date_ranges = store.date_ranges(tickers)
+        for ticker in sorted(set().union(*_uncovered(tickers, start, end, date_ranges, slack_days))):
+            first, last = date_ranges[ticker]
+            print(f"Stored data for {ticker} covers {first.date()} to {last.date()} only; "
+                  f"the rest of {pd.Timestamp(start).date()} to {pd.Timestamp(end).date()} will be filled flat.")
+
+
+def load_or_fetch(tickers, start, end, store, source=None, max_workers=8, update=False):
+    """
+    Load daily bars from the store, fetching only the tickers it does not hold yet
+    and the parts of the range their stored history does not cover, then reindex to
+    the complete business-day range and fill missing data.
+
+    A stored history starting more than a few business days after `start` is
+    backfilled (see `PriceStore.backfill`), and one ending more than a few business
+    days before `end` (or today) gets its missing tail. With `update=True` the tail
+    of every stored ticker is refreshed (see `PriceStore.update`).
+
+    Parameters:
+    - tickers: list of str, the tickers to load.
+    - start, end: str or datetime, the date range.
+    - store: PriceStore, the on-disk store to read from and write new tickers to.
+    - source: PriceSource, where to fetch missing tickers from. Defaults to Yahoo Finance.
+    - max_workers: int, the number of concurrent downloads for missing tickers.
+    - update: bool, whether to refresh the tail of every ticker already in the store.
+
+    Returns:
+    - stock_data: dict of pd.DataFrame, the filled data for each ticker.
+    - filled_days_counts: dict of pd.Series, the number of filled values per column for each ticker.
+    """
+    _ensure_stored(tickers, start, end, store, source, max_workers, update)
+    raw_data = store.load_stock_data(tickers, start=start, end=end)
+
+    stock_data = {}
+    filled_days_counts = {}
+    for ticker, data in raw_data.items():
+        stock_data[ticker], filled_days_counts[ticker] = fill_to_business_days(data, start, end)
+
+    return stock_data, filled_days_counts
+
+
+def load_panel(tickers, start, end, store, source=None, max_workers=8, update=False, fields=None):
+    """
+    Load daily bars from the store as one aligned T×N PricePanel, fetching only what the store is missing.
+
+    Parameters:
+    - tickers: list of str, the tickers to load.
+    - start, end: str or datetime, the date range.
+    - store: PriceStore, the on-disk store to read from and write new tickers to.
+    - source: PriceSource, where to fetch missing data from. Defaults to Yahoo Finance.
+    - max_workers: int, the number of concurrent downloads.
+    - update: bool, whether to refresh the tail of every ticker already in the store.
+    - fields: list of str, the price fields to load. Defaults to all fields.
+
+    Returns:
+    - PricePanel with the filled prices and the mask of filled cells.
+    """
+    _ensure_stored(tickers, start, end, store, source, max_workers, update)
+    prices = store.read(tickers, columns=fields, start=start, end=end)
+    return build_price_panel(prices, start, end, tickers=tickers, fields=fields)
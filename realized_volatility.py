@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Panel-wide realized volatility.
+
+`calculate_realized_volatility` in the notebooks runs `pct_change`, squaring
+and `rolling(window).sum()` separately for every ticker. The engine below does
+the same for the whole T×N price panel at once: the squared returns are
+computed into one buffer and every requested window is summed from cumulative
+sums of that buffer.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _rolling_sum(values, window):
+    """
+    Sum a (T, N) array over a trailing window of rows using block-local cumulative sums.
+
+    A plain `cumsum[t] - cumsum[t - window]` loses precision once the running
+    total dwarfs the window it is differenced over, and leaves round-off noise
+    where the window is all zeros (e.g. over forward-filled prices). Splitting
+    the rows into blocks of `window` rows keeps every cumulative sum local: a
+    window ending in block k is the prefix of block k plus the suffix of block
+    k - 1, so the error stays relative to the window being summed.
+    """
+    T, N = values.shape
+    blocks = -(-T // window)
+    padded = np.zeros((blocks * window, N))
+    padded[:T] = values
+
+    prefix = np.cumsum(padded.reshape(blocks, window, N), axis=1)
+    suffix = prefix[:-1, -1:, :] - prefix[:-1]
+
+    sums = prefix.copy()
+    sums[1:] += suffix
+    return sums.reshape(blocks * window, N)[:T]
+
+
+def calculate_realized_volatility_panel(prices: pd.DataFrame, windows=(21,)) -> dict:
+    """
+    Calculate realized volatility for every column of a price panel and several windows at once.
+
+    For each column and window the result equals `calculate_realized_volatility` in the
+    notebooks, before its final `dropna()`.
+
+    Parameters:
+    - prices: pd.DataFrame of shape T×N, e.g. 'Adj Close' prices with a DateTimeIndex and one column per ticker.
+    - windows: iterable of int, the rolling window sizes, e.g. (5, 21, 63).
+
+    Returns:
+    - dict mapping each window to a T×N pd.DataFrame of realized volatility, NaN where the window is incomplete.
+    """
+    values = prices.to_numpy(dtype=float)
+
+    # Calculate simple returns and square them into one shared buffer
+    returns = np.full(values.shape, np.nan)
+    returns[1:] = values[1:] / values[:-1] - 1
+    squared_returns = returns**2
+
+    # Missing returns count as zero in the sums; a window holding any of them is marked incomplete
+    valid = ~np.isnan(squared_returns)
+    squared_returns[~valid] = 0.0
+    valid_counts = np.cumsum(valid, axis=0)
+
+    realized_volatility = {}
+    for window in windows:
+        # Calculate realized variance over the rolling window
+        realized_variance = _rolling_sum(squared_returns, window)
+
+        # Number of valid returns in each window, exact in integer arithmetic
+        window_counts = valid_counts.copy()
+        window_counts[window:] -= valid_counts[:-window]
+        realized_variance[window_counts < window] = np.nan
+
+        # Calculate realized volatility as the square root of realized variance
+        realized_volatility[window] = pd.DataFrame(
+            np.sqrt(realized_variance), index=prices.index, columns=prices.columns
+        )
+
+    return realized_volatility
+
+
+class RealizedVolatilityStream:
+    """
+    Online realized volatility for many tickers, updated in constant time per new bar.
+
+    Keeps a ring buffer of the last `window` squared returns of every ticker and
+    their running sum. Each update swaps the oldest squared return for the
+    newest, so the cost per bar does not depend on the length of the history.
+    The running sum is re-summed from the buffer once per pass through the
+    ring to keep floating-point drift from accumulating.
+
+    Parameters:
+    - tickers: list of str, the tickers in the order prices are passed to `update`.
+    - window: int, the rolling window size, as in `calculate_realized_volatility`.
+    """
+
+    def __init__(self, tickers, window=21):
+        self.tickers = list(tickers)
+        self.window = window
+        self.buffer = np.zeros((window, len(self.tickers)))
+        self.rolling_sum = np.zeros(len(self.tickers))
+        self.last_price = np.full(len(self.tickers), np.nan)
+        self.valid_count = np.zeros(len(self.tickers), dtype=np.int64)
+        self.position = 0
+
+    @classmethod
+    def from_history(cls, prices: pd.DataFrame, window=21):
+        """
+        Create a stream warmed up on the tail of a T×N price panel.
+
+        Only the last `window + 1` rows are replayed, however long the history is.
+        """
+        stream = cls(prices.columns, window=window)
+        for row in prices.to_numpy(dtype=float)[-(window + 1):]:
+            stream.update(row)
+        return stream
+
+    def update(self, prices):
+        """
+        Add one bar for every ticker and return the new realized volatility.
+
+        Parameters:
+        - prices: array-like of length N in ticker order, or pd.Series indexed by ticker.
+          A missing price (NaN) carries the previous price forward, like the filled panel.
+
+        Returns:
+        - np.ndarray of length N with the realized volatility, NaN until a ticker has `window` returns.
+        """
+        if isinstance(prices, pd.Series):
+            prices = prices.reindex(self.tickers)
+        prices = np.asarray(prices, dtype=float)
+        prices = np.where(np.isnan(prices), self.last_price, prices)
+
+        # Calculate the simple return and swap its square into the ring buffer
+        returns = prices / self.last_price - 1
+        has_return = ~np.isnan(returns)
+        squared_returns = np.where(has_return, returns**2, 0.0)
+
+        self.rolling_sum += squared_returns - self.buffer[self.position]
+        self.buffer[self.position] = squared_returns
+        self.valid_count = np.minimum(self.valid_count + has_return, self.window)
+        self.last_price = prices
+
+        self.position = (self.position + 1) % self.window
+        if self.position == 0:
+            self.rolling_sum = self.buffer.sum(axis=0)
+
+        return self.volatility()
+
+    def volatility(self):
+        """
+        Return the current realized volatility of every ticker as an array of length N.
+        """
+        realized_volatility = np.sqrt(np.maximum(self.rolling_sum, 0.0))
+        realized_volatility[self.valid_count < self.window] = np.nan
+        return realized_volatility
+
+    def save(self, path):
+        """
+        Checkpoint the stream state to an `.npz` file so a restarted process can resume without replaying history.
+        """
+        np.savez(
+            path,
+            tickers=np.array(self.tickers),
+            window=self.window,
+            buffer=self.buffer,
+            rolling_sum=self.rolling_sum,
+            last_price=self.last_price,
+            valid_count=self.valid_count,
+            position=self.position,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Restore a stream checkpointed with `save`.
+        """
+        with np.load(path) as state:
+            stream = cls(state['tickers'].tolist(), window=int(state['window']))
+            stream.buffer = state['buffer']
+            stream.rolling_sum = state['rolling_sum']
+            stream.last_price = state['last_price']
+            stream.valid_count = state['valid_count']
+            stream.position = int(state['position'])
+        return stream
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""LASSO and elastic-net VAR estimation for spillover on large universes.
+
+With hundreds of tickers the unrestricted `VAR(combined_data).fit(lag_order)`
+behind `calculate_spillover_index` has N^2 p coefficients, more than a few
+years of daily data can pin down, and its normal equations become
+ill-conditioned. `fit_sparse_var` penalizes the coefficients instead. All N
+equations share the same regressors, so their Gram matrix is formed once and
+coordinate descent updates the coefficient of one regressor in every equation
+at a time. The regularization path runs from the penalty at which all
+coefficients vanish downwards, each fit warm-started from the previous one,
+and every equation keeps the penalty with the best information criterion.
+
+The coefficients are stored as a sparse matrix and the MA recursion uses
+sparse products, so the result feeds the same forecast-error variance
+decomposition, spillover matrix and `create_spillover_graph` as the dense VAR.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from spillover import forecast_error_shares, spillover_matrix_from_shares, var_design
+
+
+def _coordinate_descent(gram, cross, params, residual_cross, l1_penalty, l2_penalty, max_iterations, tolerance):
+    """
+    Minimize 1/2 b'Gb - c'b + l1 |b|_1 + l2/2 |b|^2 for every column of `params` in place.
+
+    `residual_cross` holds cross - gram @ params and is kept up to date. After a full sweep, sweeps
+    only visit the regressors that are non-zero in some equation until they converge, and a final
+    full sweep checks that no other regressor wants to enter.
+
+    Returns:
+    - int, the number of sweeps.
+    """
+    diagonal = np.diagonal(gram)
+    candidates = np.arange(len(gram))
+    full_sweep = True
+    for sweep in range(1, max_iterations + 1):
+        largest_change = 0.0
+        for k in candidates:
+            current = params[k]
+            target = residual_cross[k] + diagonal[k] * current
+            updated = np.sign(target) * np.maximum(np.abs(target) - l1_penalty, 0.0) / (diagonal[k] + l2_penalty)
+            changed = np.flatnonzero(updated != current)
+            if len(changed) == 0:
+                continue
+            change = updated - current
+            params[k] = updated
+            if 4 * len(changed) < len(change):
+                # Only the equations whose coefficient moved need their residual cross products updated
+                residual_cross[:, changed] -= np.outer(gram[:, k], change[changed])
+            else:
+                residual_cross -= np.outer(gram[:, k], change)
+            largest_change = max(largest_change, np.abs(change).max())
+
+        if largest_change < tolerance:
+            if full_sweep:
+                return sweep
+            full_sweep = True
+            candidates = np.arange(len(gram))
+        else:
+            full_sweep = False
+            candidates = np.flatnonzero(params.any(axis=1))
+    return max_iterations
+
+
+class SparseVAR:
+    """
+    A penalized VAR(p) with a constant and sparse coefficients.
+
+    Attributes:
+    - intercept: np.ndarray of shape (N,).
+    - coefs: scipy.sparse.csr_matrix of shape (N, N p), row j holding [A_1[j], ..., A_p[j]].
+    - sigma_u: np.ndarray of shape (N, N), the residual covariance.
+    - penalties: np.ndarray of shape (N,), the penalty selected for every equation.
+    - tickers: pd.Index of length N.
+    - lag_order: int.
+    """
+
+    def __init__(self, intercept, coefs, sigma_u, penalties, tickers, lag_order):
+        self.intercept = intercept
+        self.coefs = coefs
+        self.sigma_u = sigma_u
+        self.penalties = penalties
+        self.tickers = tickers
+        self.lag_order = lag_order
+
+    def dense_coefs(self):
+        """
+        Return the coefficients as a dense (p, N, N) array, as `fit_var` does.
+        """
+        N = len(self.tickers)
+        return self.coefs.toarray().reshape(N, self.lag_order, N).transpose(1, 0, 2)
+
+    def ma_coefficients(self, horizon: int) -> np.ndarray:
+        """
+        Compute the MA coefficients Phi_0, ..., Phi_{H-1} as a (H, N, N) array with sparse products.
+        """
+        N = len(self.tickers)
+        ma = np.zeros((horizon, N, N))
+        ma[0] = np.eye(N)
+        for h in range(1, horizon):
+            # Phi_h = [A_1, ..., A_p] @ [Phi_{h-1}; ...; Phi_{h-p}], with Phi_{<0} = 0
+            lags = min(h, self.lag_order)
+            ma[h] = self.coefs[:, :lags * N] @ ma[h - 1::-1][:lags].reshape(lags * N, N)
+        return ma
+
+    def spillover_matrix(self, forecast_horizon: int = 10, decomposition: str = 'orthogonal') -> pd.DataFrame:
+        """
+        Return the spillover matrix of the penalized VAR, in the layout of `calculate_spillover_index`.
+        """
+        shares = forecast_error_shares(self.ma_coefficients(forecast_horizon), self.sigma_u, decomposition)
+        return pd.DataFrame(spillover_matrix_from_shares(shares), index=self.tickers, columns=self.tickers)
+
+
+def fit_sparse_var(realized_vol_dict, lag_order: int = 2, l1_ratio: float = 1.0, n_penalties: int = 50,
+                   min_penalty_ratio: float = 1e-3, penalties=None, criterion='bic', patience: int = 5,
+                   max_iterations: int = 1000, tolerance: float = 1e-6) -> SparseVAR:
+    """
+    Fit a LASSO or elastic-net VAR(p) along a warm-started regularization path.
+
+    Each equation minimizes 1/(2n) |y - Z b|^2 + penalty (l1_ratio |b|_1 + (1 - l1_ratio)/2 |b|^2) over
+    standardized series, with an unpenalized intercept.
+
+    Parameters:
+    - realized_vol_dict: dict of pd.Series or pd.DataFrame, realized volatilities per ticker. Rows with a
+      missing value are dropped, as in `calculate_spillover_index`.
+    - lag_order: int, the lag order for the VAR model.
+    - l1_ratio: float in (0, 1], 1 for the LASSO, below 1 for the elastic net.
+    - n_penalties: int, the number of penalties on the default path.
+    - min_penalty_ratio: float, the smallest penalty of the default path relative to the largest, the
+      smallest penalty at which every coefficient is zero.
+    - penalties: decreasing array of penalties replacing the default path.
+    - criterion: str, 'bic' or 'aic', selecting the penalty of every equation from the path. None keeps
+      the last penalty for all equations.
+    - patience: int, the path stops once no equation's criterion has improved for this many penalties,
+      which skips the expensive nearly unpenalized end of the path.
+    - max_iterations: int, the maximum number of coordinate descent sweeps per penalty.
+    - tolerance: float, the largest coefficient change at convergence, in standardized units.
+
+    Returns:
+    - SparseVAR with the coefficients in the units of the data. The residual covariance is divided by
+      the number of observations.
+    """
+    combined_data = pd.DataFrame(realized_vol_dict).dropna()
+    values = combined_data.to_numpy(dtype=float)
+    N = values.shape[1]
+
+    # Standardize the series, then center the regressors and targets to leave the intercept unpenalized
+    mean, scale = values.mean(axis=0), values.std(axis=0)
+    Z, Y = var_design((values - mean) / scale, lag_order)
+    Z, Y = Z[:, 1:], Y
+    z_mean, y_mean = Z.mean(axis=0), Y.mean(axis=0)
+    Z = Z - z_mean
+    Y = Y - y_mean
+    nobs = len(Y)
+
+    gram = Z.T @ Z / nobs
+    cross = Z.T @ Y / nobs
+    target_cross = Y.T @ Y / nobs
+
+    if penalties is None:
+        largest = np.abs(cross).max() / l1_ratio
+        penalties = largest * np.geomspace(1.0, min_penalty_ratio, n_penalties)
+
+    params = np.zeros_like(cross)
+    residual_cross = cross.copy()
+    best_params = params.copy()
+    best_score = np.full(N, np.inf)
+    best_penalty = np.zeros(N)
+    since_improvement = 0
+    for penalty in penalties:
+        _coordinate_descent(gram, cross, params, residual_cross, penalty * l1_ratio, penalty * (1 - l1_ratio),
+                            max_iterations, tolerance)
+        if criterion is None:
+            best_params[:] = params
+            best_penalty[:] = penalty
+            continue
+
+        # Residual sum of squares per equation from the Gram blocks: y'y - c'b - b'(c - G b)
+        rss = np.diagonal(target_cross) - (cross * params).sum(axis=0) - (params * residual_cross).sum(axis=0)
+        df = np.count_nonzero(params, axis=0) + 1
+        if criterion == 'bic':
+            score = nobs * np.log(rss) + df * np.log(nobs)
+        elif criterion == 'aic':
+            score = nobs * np.log(rss) + 2 * df
+        else:
+            raise ValueError("criterion must be 'bic', 'aic' or None.")
+        better = score < best_score
+        best_score[better] = score[better]
+        best_params[:, better] = params[:, better]
+        best_penalty[better] = penalty
+        since_improvement = 0 if better.any() else since_improvement + 1
+        if since_improvement >= patience:
+            break
+
+    # Residual covariance of the selected coefficients, still standardized
+    sigma_u = target_cross - cross.T @ best_params - best_params.T @ cross + best_params.T @ gram @ best_params
+    sigma_u = (sigma_u + sigma_u.T) / 2
+
+    # Back to the units of the data: A_i[j, k] scales by scale_j / scale_k
+    scaled_coefs = best_params.T.reshape(N, lag_order, N)
+    coefs = scale[:, None, None] * scaled_coefs / scale[None, None, :]
+    scaled_intercept = y_mean - scaled_coefs.reshape(N, lag_order * N) @ z_mean
+    intercept = mean + scale * scaled_intercept - coefs.sum(axis=1) @ mean
+
+    return SparseVAR(
+        intercept,
+        sparse.csr_matrix(coefs.reshape(N, lag_order * N)),
+        scale[:, None] * sigma_u * scale[None, :],
+        best_penalty,
+        combined_data.columns,
+        lag_order,
+    )
+
+
+def calculate_sparse_spillover_matrix(realized_vol_dict, lag_order: int = 2, forecast_horizon: int = 10,
+                                      decomposition: str = 'orthogonal', **options) -> pd.DataFrame:
+    """
+    Calculate the spillover matrix from a penalized VAR, as a drop-in for `calculate_spillover_index`.
+
+    Parameters:
+    - realized_vol_dict: dict of pd.Series or pd.DataFrame, realized volatilities per ticker.
+    - lag_order: int, the lag order for the VAR model.
+    - forecast_horizon: int, the forecast horizon for the variance decomposition.
+    - decomposition: str, 'orthogonal' or 'generalized'.
+    - options: keyword arguments of `fit_sparse_var`, e.g. l1_ratio or criterion.
+
+    Returns:
+    - spillover_index: pd.DataFrame, the spillover index matrix in %, ready for `create_spillover_graph`.
+    """
+    model = fit_sparse_var(realized_vol_dict, lag_order=lag_order, **options)
+    return model.spillover_matrix(forecast_horizon, decomposition)
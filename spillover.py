@@ -0,0 +1,625 @@
+# -*- coding: utf-8 -*-
+"""Closed-form Diebold-Yilmaz spillover from a least-squares VAR.
+
+`calculate_spillover_index` in the notebooks fits a statsmodels `VAR`, calls
+`fevd(forecast_horizon)` and fills the spillover matrix with a Python double
+loop over `fevd.decomp`. The functions below do the same arithmetic directly:
+the VAR(p) with a constant is estimated by one least-squares solve, the MA
+coefficients follow from the VAR recursion, and the forecast-error variance
+shares of every horizon come out of a few batched matrix products. Every
+function after the estimation broadcasts over leading batch axes, so many
+VARs (e.g. rolling windows) can be decomposed at once.
+
+Two decompositions are available: 'orthogonal', the Cholesky FEVD of
+`var_result.fevd` and therefore equal to the current output, and
+'generalized', the order-invariant Pesaran-Shin FEVD with rows normalized to
+one as in Diebold and Yilmaz (2012).
+
+As in `calculate_spillover_index`, entry [i, j] of the spillover matrix is
+the share (in %) of the forecast error variance of j attributable to shocks
+in i, averaged over the horizons 1..H, with a zero diagonal.
+"""
+
+import json
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import solve_triangular
+
+from garch_fitting import process_map
+from realized_volatility import _rolling_sum
+
+INFORMATION_CRITERIA = ('aic', 'bic', 'hqic', 'fpe')
+
+
+def var_design(values: np.ndarray, lag_order: int):
+    """
+    Build the VAR design matrix [1, y_{t-1}, ..., y_{t-p}] and the targets y_t from a (T, N) array.
+
+    Returns:
+    - (Z, Y) of shapes (T - p, 1 + N p) and (T - p, N), with the regressors ordered as in statsmodels.
+    """
+    T = len(values)
+    lags = [values[lag_order - i:T - i] for i in range(1, lag_order + 1)]
+    Z = np.hstack([np.ones((T - lag_order, 1))] + lags)
+    return Z, values[lag_order:]
+
+
+def _split_var_params(params, lag_order):
+    # Regression coefficients (..., 1 + N p, N) -> intercept (..., N) and A_1..A_p as (..., p, N, N)
+    N = params.shape[-1]
+    coefs = params[..., 1:, :].reshape(params.shape[:-2] + (lag_order, N, N))
+    return params[..., 0, :], np.swapaxes(coefs, -1, -2)
+
+
+def fit_var(values: np.ndarray, lag_order: int = 2):
+    """
+    Estimate a VAR(p) with a constant by least squares, as `VAR(data).fit(lag_order)` does.
+
+    Returns:
+    - intercept: np.ndarray of shape (N,).
+    - coefs: np.ndarray of shape (p, N, N), A_i[j, k] the effect of y_k at lag i on y_j.
+    - sigma_u: np.ndarray of shape (N, N), the residual covariance with statsmodels' degrees of freedom.
+    """
+    Z, Y = var_design(values, lag_order)
+    params, *_ = np.linalg.lstsq(Z, Y, rcond=None)
+    resids = Y - Z @ params
+    sigma_u = resids.T @ resids / (len(Y) - Z.shape[1])
+    intercept, coefs = _split_var_params(params, lag_order)
+    return intercept, coefs, sigma_u
+
+
+def _var_from_cross_products(zz, zy, yy, nobs, lag_order):
+    # Least squares from the sums Z'Z, Z'Y and Y'Y of (..., K, K), (..., K, N) and (..., N, N)
+    params = np.linalg.solve(zz, zy)
+    ssr = yy - np.swapaxes(zy, -1, -2) @ params
+    sigma_u = (ssr + np.swapaxes(ssr, -1, -2)) / (2 * (nobs - zz.shape[-1]))
+    intercept, coefs = _split_var_params(params, lag_order)
+    return intercept, coefs, sigma_u
+
+
+def _information_criteria(values, max_lag):
+    # AIC, BIC, HQIC and FPE of VAR(0), ..., VAR(max_lag) with a constant on the common sample after max_lag rows
+    mean, scale = values.mean(axis=0), values.std(axis=0)
+    Z, Y = var_design((values - mean) / scale, max_lag)
+    nobs, N = Y.shape
+
+    # The design of every order is a leading block of the max_lag design, and the leading blocks of
+    # the Cholesky factor of Z'Z are the factors of those blocks. One triangular solve therefore gives
+    # the explained sum of squares of every order as a partial sum of the same rows.
+    projected = solve_triangular(np.linalg.cholesky(Z.T @ Z), Z.T @ Y, lower=True)
+    target_cross = Y.T @ Y
+    # Standardizing shifts every log-determinant by the same constant, which is added back
+    log_scale = 2 * np.log(scale).sum()
+
+    criteria = np.empty((max_lag + 1, len(INFORMATION_CRITERIA)))
+    for lag_order in range(max_lag + 1):
+        K = 1 + N * lag_order
+        ssr = target_cross - projected[:K].T @ projected[:K]
+        log_det = np.linalg.slogdet(ssr / nobs)[1] + log_scale
+        free_params = lag_order * N**2 + N
+        criteria[lag_order] = [
+            log_det + 2 * free_params / nobs,
+            log_det + np.log(nobs) * free_params / nobs,
+            log_det + 2 * np.log(np.log(nobs)) * free_params / nobs,
+            ((nobs + K) / (nobs - K)) ** N * np.exp(log_det),
+        ]
+    return criteria
+
+
+def lag_order_criteria(realized_vol_dict, max_lag: int = 10) -> pd.DataFrame:
+    """
+    Score every VAR lag order up to `max_lag` by information criteria from one design matrix.
+
+    The values equal `VAR(combined_data).select_order(max_lag).ics`: all orders are fitted on the
+    rows after the first `max_lag`, with a constant.
+
+    Parameters:
+    - realized_vol_dict: dict of pd.Series or pd.DataFrame, realized volatilities per ticker.
+    - max_lag: int, the largest lag order considered.
+
+    Returns:
+    - pd.DataFrame indexed by 'Lag order' 0..max_lag with the columns 'aic', 'bic', 'hqic' and 'fpe'.
+    """
+    combined_data = pd.DataFrame(realized_vol_dict).dropna()
+    criteria = pd.DataFrame(_information_criteria(combined_data.to_numpy(dtype=float), max_lag),
+                            columns=INFORMATION_CRITERIA)
+    criteria.index.name = 'Lag order'
+    return criteria
+
+
+def select_lag_order(realized_vol_dict, max_lag: int = 10, criterion: str = 'bic') -> int:
+    """
+    Return the VAR lag order minimizing an information criterion, as `select_order(max_lag).selected_orders`.
+    """
+    if criterion not in INFORMATION_CRITERIA:
+        raise ValueError(f"criterion must be one of {INFORMATION_CRITERIA}.")
+    combined_data = pd.DataFrame(realized_vol_dict).dropna()
+    criteria = _information_criteria(combined_data.to_numpy(dtype=float), max_lag)
+    return int(np.argmin(criteria[:, INFORMATION_CRITERIA.index(criterion)]))
+
+
+def _lag_order_task(task):
+    values, window, step, max_lag, column = task
+    return [
+        int(np.argmin(_information_criteria(values[stop + 1 - window:stop + 1], max_lag)[:, column]))
+        for stop in range(window - 1, len(values), step)
+    ]
+
+
+def select_lag_orders(datasets, max_lag: int = 10, criterion: str = 'bic', max_workers: int = 1,
+                      threads_per_worker: int = 1):
+    """
+    Select the VAR lag order of several datasets, e.g. the train, validation and test splits.
+
+    Parameters:
+    - datasets: dict or list of realized volatility dicts or DataFrames.
+    - max_lag: int, the largest lag order considered.
+    - criterion: str, 'aic', 'bic', 'hqic' or 'fpe'.
+    - max_workers: int, the number of worker processes. Defaults to 1, in-process, since each dataset
+      takes only a few Cholesky solves; None uses the number of CPUs.
+    - threads_per_worker: int, the BLAS/OpenMP threads allowed in each worker.
+
+    Returns:
+    - the selected lag orders, as a dict with the keys of `datasets` or a list in its order.
+    """
+    if criterion not in INFORMATION_CRITERIA:
+        raise ValueError(f"criterion must be one of {INFORMATION_CRITERIA}.")
+    names = list(datasets) if isinstance(datasets, dict) else None
+    frames = [pd.DataFrame(data).dropna() for data in (datasets.values() if names is not None else datasets)]
+    column = INFORMATION_CRITERIA.index(criterion)
+    tasks = [(frame.to_numpy(dtype=float), len(frame), 1, max_lag, column) for frame in frames]
+    orders = [task_orders[0] for task_orders in process_map(
+        _lag_order_task, tasks, max_workers=max_workers, threads_per_worker=threads_per_worker)]
+    return dict(zip(names, orders)) if names is not None else orders
+
+
+def rolling_lag_orders(realized_vol_dict, window: int = 200, step: int = 1, max_lag: int = 10,
+                       criterion: str = 'bic', windows_per_task: int = 64, max_workers=None,
+                       threads_per_worker: int = 1) -> pd.Series:
+    """
+    Select the VAR lag order of every rolling window, with the windows spread over a process pool.
+
+    Parameters:
+    - realized_vol_dict: dict of pd.Series or pd.DataFrame, realized volatilities per ticker. Rows with a
+      missing value are dropped first.
+    - window, step: int, the rolling windows, as in `rolling_spillover`.
+    - max_lag: int, the largest lag order considered.
+    - criterion: str, 'aic', 'bic', 'hqic' or 'fpe'.
+    - windows_per_task: int, the number of consecutive windows scored by one task.
+    - max_workers: int, the number of worker processes. Defaults to the number of CPUs; 1 runs in-process.
+    - threads_per_worker: int, the BLAS/OpenMP threads allowed in each worker.
+
+    Returns:
+    - pd.Series of lag orders indexed by the last date of every window.
+    """
+    if criterion not in INFORMATION_CRITERIA:
+        raise ValueError(f"criterion must be one of {INFORMATION_CRITERIA}.")
+    combined_data = pd.DataFrame(realized_vol_dict).dropna()
+    values = combined_data.to_numpy(dtype=float)
+    ends = np.arange(window - 1, len(values), step)
+    column = INFORMATION_CRITERIA.index(criterion)
+
+    # Each task gets the rows of a run of consecutive windows
+    tasks = []
+    for start in range(0, len(ends), windows_per_task):
+        batch = ends[start:start + windows_per_task]
+        tasks.append((values[batch[0] + 1 - window:batch[-1] + 1], window, step, max_lag, column))
+    orders = process_map(_lag_order_task, tasks, max_workers=max_workers, threads_per_worker=threads_per_worker)
+    return pd.Series(np.concatenate(orders).astype(int), index=combined_data.index[ends], name='Lag order')
+
+
+def ma_coefficients(coefs: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Compute the MA coefficients Phi_0 = I, Phi_1, ..., Phi_{H-1} of a VAR.
+
+    Parameters:
+    - coefs: np.ndarray of shape (..., p, N, N).
+    - horizon: int, the number of MA matrices H.
+
+    Returns:
+    - np.ndarray of shape (..., H, N, N).
+    """
+    lag_order, N = coefs.shape[-3], coefs.shape[-1]
+    ma = np.zeros(coefs.shape[:-3] + (horizon, N, N))
+    ma[..., 0, :, :] = np.eye(N)
+    for h in range(1, horizon):
+        for i in range(1, min(h, lag_order) + 1):
+            ma[..., h, :, :] += coefs[..., i - 1, :, :] @ ma[..., h - i, :, :]
+    return ma
+
+
+def forecast_error_shares(ma: np.ndarray, sigma_u: np.ndarray, decomposition: str = 'orthogonal') -> np.ndarray:
+    """
+    Decompose the forecast error variance of every variable and horizon into the shares of each shock.
+
+    Parameters:
+    - ma: np.ndarray of shape (..., H, N, N), the MA coefficients.
+    - sigma_u: np.ndarray of shape (..., N, N), the residual covariance.
+    - decomposition: str, 'orthogonal' (Cholesky, as statsmodels' `fevd`) or 'generalized' (Pesaran-Shin,
+      rows normalized to one).
+
+    Returns:
+    - np.ndarray of shape (..., H, N, N) whose [h, j, k] entry is the share of the (h + 1)-step forecast
+      error variance of variable j due to shock k, i.e. statsmodels' `fevd.decomp[j][h, k]`.
+    """
+    if decomposition == 'orthogonal':
+        responses = ma @ np.linalg.cholesky(sigma_u)[..., None, :, :]
+        contributions = np.cumsum(responses**2, axis=-3)
+    elif decomposition == 'generalized':
+        responses = ma @ sigma_u[..., None, :, :]
+        shock_variances = np.diagonal(sigma_u, axis1=-2, axis2=-1)[..., None, None, :]
+        contributions = np.cumsum(responses**2 / shock_variances, axis=-3)
+    else:
+        raise ValueError("decomposition must be 'orthogonal' or 'generalized'.")
+    return contributions / contributions.sum(axis=-1, keepdims=True)
+
+
+def spillover_matrix_from_shares(shares: np.ndarray) -> np.ndarray:
+    """
+    Turn forecast error variance shares of shape (..., H, N, N) into spillover matrices of shape (..., N, N).
+
+    Entry [i, j] is `fevd.decomp[j][:, i].sum() / fevd.decomp[j].sum()` in %, with a zero diagonal,
+    exactly as `calculate_spillover_index` fills it.
+    """
+    totals = shares.sum(axis=-3)
+    matrix = np.swapaxes(totals / totals.sum(axis=-1, keepdims=True), -1, -2) * 100
+    N = matrix.shape[-1]
+    matrix[..., np.arange(N), np.arange(N)] = 0.0
+    return matrix
+
+
+def spillover_matrices_by_horizon(shares: np.ndarray) -> np.ndarray:
+    """
+    Turn forecast error variance shares of shape (..., H, N, N) into the spillover matrices of every
+    forecast horizon 1..H at once, of shape (..., H, N, N).
+
+    Entry [h - 1] equals `spillover_matrix_from_shares(shares[..., :h, :, :])`: the horizon-h matrix only
+    needs the shares of the first h horizons, so all of them are prefix sums of the same array.
+    """
+    totals = np.cumsum(shares, axis=-3)
+    matrices = np.swapaxes(totals / totals.sum(axis=-1, keepdims=True), -1, -2) * 100
+    N = matrices.shape[-1]
+    matrices[..., np.arange(N), np.arange(N)] = 0.0
+    return matrices
+
+
+def calculate_spillover_matrix(realized_vol_dict, lag_order=2, forecast_horizon: int = 10,
+                               decomposition: str = 'orthogonal', max_lag: int = 10) -> pd.DataFrame:
+    """
+    Calculate the Diebold-Yilmaz spillover matrix without statsmodels.
+
+    With the default orthogonal decomposition the result equals `calculate_spillover_index`.
+
+    Parameters:
+    - realized_vol_dict: dict of pd.Series or pd.DataFrame, realized volatilities per ticker.
+    - lag_order: int, the lag order for the VAR model, or an information criterion ('aic', 'bic',
+      'hqic' or 'fpe') selecting it up to `max_lag` with `select_lag_order`.
+    - forecast_horizon: int, the forecast horizon for the variance decomposition.
+    - decomposition: str, 'orthogonal' or 'generalized'.
+    - max_lag: int, the largest lag order considered when `lag_order` is a criterion.
+
+    Returns:
+    - spillover_index: pd.DataFrame, the spillover index matrix in %.
+    """
+    combined_data = pd.DataFrame(realized_vol_dict).dropna()
+    if isinstance(lag_order, str):
+        lag_order = select_lag_order(combined_data, max_lag, lag_order)
+    _, coefs, sigma_u = fit_var(combined_data.to_numpy(dtype=float), lag_order)
+    shares = forecast_error_shares(ma_coefficients(coefs, forecast_horizon), sigma_u, decomposition)
+    return pd.DataFrame(spillover_matrix_from_shares(shares), index=combined_data.columns, columns=combined_data.columns)
+
+
+def calculate_spillover_matrices(realized_vol_dict, lag_order=2, max_horizon: int = 30,
+                                 decomposition: str = 'orthogonal', max_lag: int = 10) -> dict:
+    """
+    Calculate the spillover matrix of every forecast horizon up to `max_horizon` from one VAR fit.
+
+    The MA coefficients and cumulative variance shares are computed once up to `max_horizon`, so a
+    sweep over all horizons costs about as much as a single `calculate_spillover_matrix` call.
+
+    Parameters:
+    - realized_vol_dict: dict of pd.Series or pd.DataFrame, realized volatilities per ticker.
+    - lag_order: int, the lag order for the VAR model, or an information criterion selecting it.
+    - max_horizon: int, the largest forecast horizon.
+    - decomposition: str, 'orthogonal' or 'generalized'.
+    - max_lag: int, the largest lag order considered when `lag_order` is a criterion.
+
+    Returns:
+    - dict mapping each horizon h = 1..max_horizon to the spillover matrix that
+      `calculate_spillover_matrix(..., forecast_horizon=h)` returns.
+    """
+    combined_data = pd.DataFrame(realized_vol_dict).dropna()
+    if isinstance(lag_order, str):
+        lag_order = select_lag_order(combined_data, max_lag, lag_order)
+    _, coefs, sigma_u = fit_var(combined_data.to_numpy(dtype=float), lag_order)
+    shares = forecast_error_shares(ma_coefficients(coefs, max_horizon), sigma_u, decomposition)
+    matrices = spillover_matrices_by_horizon(shares)
+    return {
+        h: pd.DataFrame(matrices[h - 1], index=combined_data.columns, columns=combined_data.columns)
+        for h in range(1, max_horizon + 1)
+    }
+
+
+def spillover_table(spillover_index: pd.DataFrame):
+    """
+    Summarize a spillover matrix into directional and total spillovers.
+
+    Parameters:
+    - spillover_index: pd.DataFrame, a spillover matrix with entry [i, j] from i to j, in %.
+
+    Returns:
+    - directional: pd.DataFrame indexed by ticker with 'To others' (row sums), 'From others' (column sums)
+      and 'Net' (to minus from).
+    - total: float, the total spillover index, the sum of all off-diagonal entries divided by N.
+    """
+    matrix = spillover_index.to_numpy()
+    to_others = matrix.sum(axis=1)
+    from_others = matrix.sum(axis=0)
+    directional = pd.DataFrame({
+        'To others': to_others,
+        'From others': from_others,
+        'Net': to_others - from_others,
+    }, index=spillover_index.index)
+    return directional, matrix.sum() / len(matrix)
+
+
+class RollingSpillover:
+    """
+    Spillover matrices of a sequence of rolling windows, held as one compact float32 tensor.
+
+    Attributes:
+    - values: np.ndarray or np.memmap of shape (T, N, N), float32, the spillover matrix (in %) of the
+      window ending on each date.
+    - dates: pd.DatetimeIndex of length T, the last date of every window.
+    - tickers: pd.Index of length N.
+    """
+
+    def __init__(self, values, dates, tickers):
+        self.values = values
+        self.dates = dates
+        self.tickers = tickers
+
+    def frame(self, date):
+        """
+        Return the spillover matrix of the window ending on one date, as `create_spillover_graph` expects.
+        """
+        row = self.dates.get_loc(pd.Timestamp(date))
+        return pd.DataFrame(self.values[row], index=self.tickers, columns=self.tickers)
+
+    def table(self, date):
+        """
+        Return the directional spillovers and the total index of the window ending on one date.
+        """
+        return spillover_table(self.frame(date))
+
+    def total(self) -> pd.Series:
+        """
+        Return the total spillover index of every window, as defined in `spillover_table`.
+        """
+        return pd.Series(self.values.sum(axis=(1, 2), dtype=float) / len(self.tickers), index=self.dates,
+                         name='Total spillover')
+
+    def save(self, path):
+        """
+        Persist the spillover matrices as `<path>.npy` with a `<path>.json` index sidecar.
+        """
+        values = np.lib.format.open_memmap(f"{path}.npy", mode='w+', dtype=np.float32, shape=self.values.shape)
+        values[:] = self.values
+        values.flush()
+        del values
+        with open(f"{path}.json", 'w') as f:
+            json.dump({
+                'dates': [date.isoformat() for date in self.dates],
+                'tickers': [str(ticker) for ticker in self.tickers],
+            }, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='c'):
+        """
+        Memory-map spillover matrices written by `save`.
+        """
+        values = np.load(f"{path}.npy", mmap_mode=mmap_mode)
+        with open(f"{path}.json") as f:
+            index = json.load(f)
+        return cls(values, pd.DatetimeIndex(index['dates']), pd.Index(index['tickers']))
+
+
+def rolling_spillover(realized_vol_dict, window: int = 200, step: int = 1, lag_order=2,
+                      forecast_horizon: int = 10, decomposition: str = 'orthogonal', batch_size: int = 256,
+                      max_lag: int = 10, max_workers=None, threads_per_worker: int = 1) -> RollingSpillover:
+    """
+    Calculate the spillover matrix of every rolling window of a volatility panel.
+
+    Each window's matrix equals `calculate_spillover_matrix` on the `window` rows ending on its date.
+    Instead of refitting every window, the cross products of the VAR regressors and targets are
+    summed over all windows at once with a block-local rolling sum. The windows of a batch are then
+    solved, expanded into MA coefficients and decomposed together with batched linear algebra.
+
+    Parameters:
+    - realized_vol_dict: dict of pd.Series or pd.DataFrame, realized volatilities per ticker. Rows with a
+      missing value are dropped first, as in `calculate_spillover_index`.
+    - window: int, the number of rows in each window.
+    - step: int, the number of rows between the ends of consecutive windows.
+    - lag_order: int, the lag order for the VAR model, or an information criterion ('aic', 'bic',
+      'hqic' or 'fpe') selecting it for every window with `rolling_lag_orders`.
+    - forecast_horizon: int, the forecast horizon for the variance decomposition.
+    - decomposition: str, 'orthogonal' or 'generalized'.
+    - batch_size: int, the number of windows decomposed together, which bounds the memory used.
+    - max_lag: int, the largest lag order considered when `lag_order` is a criterion.
+    - max_workers, threads_per_worker: int, the process pool of the lag order selection.
+
+    Returns:
+    - RollingSpillover indexed by the last date of every window.
+    """
+    combined_data = pd.DataFrame(realized_vol_dict).dropna()
+    values = combined_data.to_numpy(dtype=float)
+    N = values.shape[1]
+    if len(values) < window:
+        raise ValueError(f"{len(values)} complete rows are fewer than the window of {window}.")
+
+    ends = np.arange(window - 1, len(values), step)
+    if isinstance(lag_order, str):
+        orders = rolling_lag_orders(combined_data, window, step, max_lag, lag_order, max_workers=max_workers,
+                                    threads_per_worker=threads_per_worker).to_numpy()
+    else:
+        orders = np.full(len(ends), lag_order)
+
+    # The variance shares do not change when a series is shifted or rescaled, and
+    # standardized series keep the summed cross products well conditioned
+    values = (values - values.mean(axis=0)) / values.std(axis=0)
+    designs = {}
+    for order in np.unique(orders):
+        Z, Y = var_design(values, order)
+        designs[order] = np.hstack([Z, Y])
+
+    matrices = np.empty((len(ends), N, N), dtype=np.float32)
+    for start in range(0, len(ends), batch_size):
+        for order in np.unique(orders[start:start + batch_size]):
+            selected = start + np.flatnonzero(orders[start:start + batch_size] == order)
+            regressors = designs[order]
+            K = regressors.shape[1] - N
+            nobs = window - order
+
+            # Regression row r has its target on row r + order of the panel
+            batch = ends[selected] - order
+            first = batch[0] - nobs + 1
+            rows = regressors[first:batch[-1] + 1]
+            products = (rows[:, :, None] * rows[:, None, :]).reshape(len(rows), -1)
+            cross = _rolling_sum(products, nobs)[batch - first].reshape(len(batch), K + N, K + N)
+
+            _, coefs, sigma_u = _var_from_cross_products(cross[:, :K, :K], cross[:, :K, K:], cross[:, K:, K:],
+                                                         nobs, order)
+            shares = forecast_error_shares(ma_coefficients(coefs, forecast_horizon), sigma_u, decomposition)
+            matrices[selected] = spillover_matrix_from_shares(shares)
+
+    return RollingSpillover(matrices, combined_data.index[ends], combined_data.columns)
+
+
+class IncrementalVAR:
+    """
+    Least-squares VAR(p) with a constant over an expanding or sliding window, updated one observation at a time.
+
+    The estimator keeps the cross products of the regressors and targets of its window, the inverse
+    of Z'Z and the coefficients. A new observation enters, and with a sliding window the oldest one
+    leaves, through rank-one recursive least squares updates (Sherman-Morrison) costing O((Np)^2 + N^2 p)
+    instead of a refit over the whole window. The spillover matrix is then recomputed from the
+    updated coefficients only. The inverse is recomputed exactly from the cross products every
+    `refresh_every` updates so that rounding errors of the downdates cannot accumulate.
+
+    The series are standardized with the mean and standard deviation of the initial data, which keeps
+    the recursions well conditioned and leaves the variance shares unchanged.
+
+    Attributes:
+    - lag_order: int, the VAR lag order p.
+    - window: int or None, the number of rows in the window, None for an expanding window.
+    - tickers: pd.Index of length N.
+    - last_date: the date of the most recent observation.
+    - nobs: int, the number of regression rows in the window.
+    """
+
+    def __init__(self, initial_data, lag_order: int = 2, window=None, refresh_every: int = 250):
+        """
+        Parameters:
+        - initial_data: dict of pd.Series or pd.DataFrame, the first window of realized volatilities.
+          Rows with a missing value are dropped.
+        - lag_order: int, the lag order for the VAR model.
+        - window: int, the number of rows kept, as in `rolling_spillover`. None keeps every row.
+        - refresh_every: int, the number of updates between exact recomputations of the inverse.
+        """
+        combined_data = pd.DataFrame(initial_data).dropna()
+        values = combined_data.to_numpy(dtype=float)
+        if window is not None:
+            values = values[-window:]
+            combined_data = combined_data.iloc[-window:]
+        self.lag_order = lag_order
+        self.window = window
+        self.refresh_every = refresh_every
+        self.tickers = combined_data.columns
+        self.last_date = combined_data.index[-1]
+
+        self._mean = values.mean(axis=0)
+        self._scale = values.std(axis=0)
+        scaled = (values - self._mean) / self._scale
+        Z, Y = var_design(scaled, lag_order)
+        self._regressors = deque(np.hstack([Z, Y]))
+        self._recent = scaled[len(scaled) - lag_order:]
+        self._K = Z.shape[1]
+        self._cross = np.hstack([Z, Y]).T @ np.hstack([Z, Y])
+        self.refresh()
+
+    @property
+    def nobs(self):
+        return len(self._regressors)
+
+    def refresh(self):
+        """
+        Recompute the inverse of Z'Z and the coefficients exactly from the cross products.
+        """
+        K = self._K
+        self._inverse = np.linalg.inv(self._cross[:K, :K])
+        self._params = self._inverse @ self._cross[:K, K:]
+        self._updates = 0
+
+    def _rank_one(self, row, sign):
+        # Add (sign=1) or remove (sign=-1) one regression row [z, y]
+        K = self._K
+        z, y = row[:K], row[K:]
+        self._cross += sign * np.outer(row, row)
+        inverse_z = self._inverse @ z
+        denominator = 1.0 + sign * (z @ inverse_z)
+        errors = y - z @ self._params
+        self._inverse -= sign * np.outer(inverse_z, inverse_z) / denominator
+        self._params += sign * np.outer(inverse_z, errors) / denominator
+
+    def update(self, observation, date=None):
+        """
+        Add the observation of a new date and, with a sliding window, drop the oldest one.
+
+        Parameters:
+        - observation: pd.Series indexed by ticker, or array of length N in ticker order.
+        - date: the date of the observation. Defaults to the Series name.
+        """
+        if isinstance(observation, pd.Series):
+            if date is None:
+                date = observation.name
+            observation = observation.reindex(self.tickers).to_numpy(dtype=float)
+        scaled = (np.asarray(observation, dtype=float) - self._mean) / self._scale
+
+        row = np.concatenate([[1.0], self._recent[::-1].ravel(), scaled])
+        self._rank_one(row, 1)
+        self._regressors.append(row)
+        if self.window is not None and self.nobs > self.window - self.lag_order:
+            self._rank_one(self._regressors.popleft(), -1)
+        self._recent = np.vstack([self._recent[1:], scaled])
+        self.last_date = date
+
+        self._updates += 1
+        if self._updates >= self.refresh_every:
+            self.refresh()
+
+    def fit(self):
+        """
+        Return the current VAR estimates in the units of the data.
+
+        Returns:
+        - (intercept, coefs, sigma_u) as from `fit_var` on the rows of the window.
+        """
+        K = self._K
+        sigma_u = self._cross[K:, K:] - self._cross[:K, K:].T @ self._params
+        sigma_u = (sigma_u + sigma_u.T) / (2 * (self.nobs - K))
+        scaled_intercept, scaled_coefs = _split_var_params(self._params, self.lag_order)
+
+        # Undo the standardization: y = mean + scale * y_scaled
+        coefs = self._scale[:, None] * scaled_coefs / self._scale[None, :]
+        intercept = self._mean + self._scale * scaled_intercept - coefs.sum(axis=0) @ self._mean
+        return intercept, coefs, self._scale[:, None] * sigma_u * self._scale[None, :]
+
+    def spillover_matrix(self, forecast_horizon: int = 10, decomposition: str = 'orthogonal') -> pd.DataFrame:
+        """
+        Return the spillover matrix of the current window, equal to `calculate_spillover_matrix` on its rows.
+        """
+        _, coefs, sigma_u = self.fit()
+        shares = forecast_error_shares(ma_coefficients(coefs, forecast_horizon), sigma_u, decomposition)
+        return pd.DataFrame(spillover_matrix_from_shares(shares), index=self.tickers, columns=self.tickers)
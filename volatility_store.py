@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Memory-mapped float32 volatility panels.
+
+`realized_vol_dict` and `garch_vol_dict` used to be rebuilt from scratch in
+every notebook and then copied into torch tensors one column at a time. The
+helpers below persist a computed volatility panel as one contiguous T×N
+float32 `.npy` file next to a small JSON sidecar holding the dates and
+tickers. Loading maps the file copy-on-write, so several training processes
+share the same physical pages and `torch.from_numpy` wraps them without a copy.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class VolatilityPanel:
+    """
+    T×N float32 volatility panel backed by a memory-mapped array.
+
+    Attributes:
+    - values: np.ndarray or np.memmap of shape (T, N), float32, C-contiguous.
+    - dates: pd.DatetimeIndex of length T.
+    - tickers: pd.Index of length N.
+    """
+
+    def __init__(self, values, dates, tickers):
+        self.values = values
+        self.dates = dates
+        self.tickers = tickers
+
+    def to_frame(self):
+        """
+        Return the panel as a T×N DataFrame that shares memory with the array.
+        """
+        return pd.DataFrame(self.values, index=self.dates, columns=self.tickers, copy=False)
+
+    def to_dict(self):
+        """
+        Return the panel as the dictionary of per-ticker pd.Series used by the notebooks,
+        with the dates on which a ticker has no value dropped.
+        """
+        return {ticker: series.dropna() for ticker, series in self.to_frame().items()}
+
+    def tensor(self, tickers=None, rows=slice(None)):
+        """
+        Return the panel, or a block of it, as a float32 torch tensor.
+
+        Parameters:
+        - tickers: list of str, the columns in the order wanted. Defaults to all tickers in stored order.
+        - rows: slice, the dates to include.
+
+        Returns:
+        - torch.Tensor of shape (rows, tickers). When the tickers are taken in stored order the
+          tensor is a view of the memory-mapped file; reordering them costs a single gather.
+        """
+        import torch
+
+        block = self.values[rows]
+        if tickers is not None and list(tickers) != list(self.tickers):
+            block = block[:, self.tickers.get_indexer(tickers)]
+        return torch.from_numpy(block)
+
+
+def save_volatility_panel(volatility, path, cache_key=None):
+    """
+    Persist a volatility panel as a float32 `.npy` file with a JSON index sidecar.
+
+    Parameters:
+    - volatility: dict of pd.Series or pd.DataFrame, the volatility of each ticker.
+    - path: str, the file path without extension; writes `<path>.npy` and `<path>.json`.
+    - cache_key: str, optional key of the inputs the panel was computed from, see `cached_volatility_panel`.
+
+    Returns:
+    - VolatilityPanel memory-mapped from the written file.
+    """
+    frame = pd.DataFrame(volatility)
+    frame.index = pd.to_datetime(frame.index)
+
+    values = np.lib.format.open_memmap(f"{path}.npy", mode='w+', dtype=np.float32, shape=frame.shape)
+    values[:] = frame.to_numpy(dtype=np.float32)
+    values.flush()
+    del values
+
+    with open(f"{path}.json", 'w') as f:
+        json.dump({
+            'dates': [date.isoformat() for date in frame.index],
+            'tickers': [str(ticker) for ticker in frame.columns],
+            'cache_key': cache_key,
+        }, f)
+
+    return load_volatility_panel(path)
+
+
+def load_volatility_panel(path, mmap_mode='c'):
+    """
+    Memory-map a volatility panel written by `save_volatility_panel`.
+
+    Parameters:
+    - path: str, the file path without extension.
+    - mmap_mode: str, the numpy memmap mode. The default copy-on-write mode shares pages between
+      processes and gives writable arrays, which `torch.from_numpy` expects.
+
+    Returns:
+    - VolatilityPanel backed by the memory-mapped file.
+    """
+    values = np.load(f"{path}.npy", mmap_mode=mmap_mode)
+    with open(f"{path}.json") as f:
+        index = json.load(f)
+    return VolatilityPanel(values, pd.DatetimeIndex(index['dates']), pd.Index(index['tickers']))
+
+
+def price_fingerprint(price_panel):
+    """
+    Return a digest of a PricePanel that changes whenever a price, a date or a ticker changes,
+    e.g. after `PriceStore.update` revised some bars.
+    """
+    digest = hashlib.sha1(np.ascontiguousarray(price_panel.values).tobytes())
+    digest.update(price_panel.dates.to_numpy(dtype='datetime64[ns]').tobytes())
+    digest.update(json.dumps([str(ticker) for ticker in price_panel.tickers]).encode())
+    return digest.hexdigest()
+
+
+def _read_cache_key(path):
+    with open(f"{path}.json") as f:
+        return json.load(f).get('cache_key')
+
+
+def cached_volatility_panel(path, compute, last_date=None, tickers=None, fingerprint=None, spec=None):
+    """
+    Load a persisted volatility panel, computing and saving it first if it is missing or was computed
+    from other inputs.
+
+    The sidecar records a key of the requested last date, tickers, input fingerprint and model
+    specification. The stored panel is only reused when that key equals the current one, so a panel
+    written for another date range, another universe, prices that have since been revised or another
+    estimator setting is recomputed.
+
+    Parameters:
+    - path: str, the file path without extension.
+    - compute: callable returning a dict of pd.Series or a pd.DataFrame of volatilities.
+    - last_date: datetime, the last date of the inputs.
+    - tickers: list of str, the tickers requested; the panel holds those of them `compute` returned,
+      in this order.
+    - fingerprint: str, a digest of the inputs, e.g. `price_fingerprint(price_panel)`.
+    - spec: dict of JSON-serializable settings `compute` depends on, e.g. {'p': 1, 'q': 1,
+      'scale_factor': 100} for GARCH or {'estimator': 'parkinson', 'window': 21} for realized volatility.
+
+    Returns:
+    - VolatilityPanel backed by the memory-mapped file.
+    """
+    cache_key = hashlib.sha1(json.dumps({
+        'last_date': None if last_date is None else pd.Timestamp(last_date).isoformat(),
+        'tickers': None if tickers is None else [str(ticker) for ticker in tickers],
+        'fingerprint': fingerprint,
+        'spec': spec,
+    }, sort_keys=True).encode()).hexdigest()
+
+    if os.path.exists(f"{path}.npy") and os.path.exists(f"{path}.json") and _read_cache_key(path) == cache_key:
+        return load_volatility_panel(path)
+
+    volatility = pd.DataFrame(compute())
+    if tickers is not None:
+        volatility = volatility[[ticker for ticker in tickers if ticker in volatility.columns]]
+    return save_volatility_panel(volatility, path, cache_key=cache_key)
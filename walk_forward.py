@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Walk-forward evaluation over the volatility panel.
+
+The notebooks evaluate every model on one static 50/20/30 split, which gives
+a single validation number per model. `walk_forward_splits` generates
+expanding- or rolling-window folds over the aligned panel, each a PanelSplit
+with train, validation and test parts, separated by an embargo gap so that
+overlapping rolling-window targets cannot leak from one part into the next.
+`run_walk_forward` evaluates the folds in a process pool; each fold is
+independent, so the wall time falls with the number of cores. Memory-mapped
+panels are re-opened from their file in every worker instead of being copied
+into each task.
+
+The per-fold work (fitting the spillover or correlation graph on the training
+part, training the model, computing the metrics) is passed in as a function,
+since the models live in the notebooks. `train_graph_model` is the training
+loop the notebooks share.
+"""
+
+import mmap
+import multiprocessing
+import sys
+
+import numpy as np
+import pandas as pd
+
+from garch_fitting import process_map
+from panel_splits import SPLIT_NAMES, PanelSplit
+
+
+def walk_forward_splits(panel, train_size: int, validation_size: int, test_size: int, step=None,
+                        window: str = 'expanding', embargo: int = 0) -> list:
+    """
+    Generate walk-forward folds over a panel.
+
+    Parameters:
+    - panel: VolatilityPanel, pd.DataFrame of shape T×N, or dict of pd.Series.
+    - train_size: int, the number of training rows of the first fold (of every fold for a rolling window).
+    - validation_size, test_size: int, the number of validation and test rows of every fold.
+    - step: int, the number of rows the folds move forward by. Defaults to `test_size`, so the test
+      parts tile the sample.
+    - window: str, 'expanding' keeps the start of the training part fixed, 'rolling' moves it along.
+    - embargo: int, the number of rows dropped between train and validation and between validation
+      and test, e.g. the realized volatility window.
+
+    Returns:
+    - list of PanelSplit, one per fold, over the rows on which every ticker has a value.
+    """
+    if window not in ('expanding', 'rolling'):
+        raise ValueError("window must be 'expanding' or 'rolling'.")
+    if step is None:
+        step = test_size
+
+    if isinstance(panel, (dict, pd.DataFrame)):
+        frame = pd.DataFrame(panel)
+        values, dates, tickers = frame.to_numpy(), frame.index, frame.columns
+    else:
+        values, dates, tickers = panel.values, panel.dates, panel.tickers
+
+    complete = np.flatnonzero(~np.isnan(values).any(axis=1))
+    first, last = int(complete[0]), int(complete[-1]) + 1
+
+    splits = []
+    train_stop = first + train_size
+    while True:
+        validation_start = train_stop + embargo
+        test_start = validation_start + validation_size + embargo
+        if test_start + test_size > last:
+            break
+        train_start = first if window == 'expanding' else train_stop - train_size
+        boundaries = dict(zip(SPLIT_NAMES, [
+            (train_start, train_stop),
+            (validation_start, validation_start + validation_size),
+            (test_start, test_start + test_size),
+        ]))
+        splits.append(PanelSplit(values, dates, tickers, boundaries))
+        train_stop += step
+    return splits
+
+
+def _shareable(values):
+    # A memory-mapped panel travels as its file location and is re-opened by the worker
+    if isinstance(values, np.memmap) and isinstance(values.base, mmap.mmap):
+        return ('memmap', values.filename, values.offset, values.shape, values.dtype.str,
+                'F' if values.flags.f_contiguous and not values.flags.c_contiguous else 'C')
+    return ('array', values)
+
+
+def _attach(shared):
+    if shared[0] == 'memmap':
+        _, filename, offset, shape, dtype, order = shared
+        return np.memmap(filename, dtype=dtype, mode='c', offset=offset, shape=shape, order=order)
+    return shared[1]
+
+
+def _fold_task(task):
+    evaluate_fold, shared, dates, tickers, boundaries, threads_per_worker = task
+    # torch sizes its intra-op pool on import, which may have happened before the fork. In-process
+    # runs leave the caller's pool alone
+    torch = sys.modules.get('torch')
+    if torch is not None and multiprocessing.parent_process() is not None:
+        torch.set_num_threads(threads_per_worker)
+    return evaluate_fold(PanelSplit(_attach(shared), dates, tickers, boundaries))
+
+
+def run_walk_forward(splits, evaluate_fold, max_workers=None, threads_per_worker: int = 1,
+                     start_method: str = 'spawn'):
+    """
+    Evaluate walk-forward folds in a process pool and aggregate their metrics.
+
+    Parameters:
+    - splits: list of PanelSplit, e.g. from `walk_forward_splits`.
+    - evaluate_fold: callable taking a PanelSplit and returning a dict of scalar metrics. It must be
+      picklable: a module-level function, or, with start_method='fork', a function defined in the notebook.
+    - max_workers: int, the number of worker processes. Defaults to the number of CPUs; 1 runs in-process.
+    - threads_per_worker: int, the BLAS/OpenMP (and torch) threads allowed in each worker.
+    - start_method: str, the multiprocessing start method of the pool. 'fork' is only safe before the
+      parent has run torch or another OpenMP library: forking an initialized OpenMP thread pool can
+      leave the workers hung. After training in the parent, use 'spawn' with a module-level
+      `evaluate_fold`, or max_workers=1.
+
+    Returns:
+    - fold_results: pd.DataFrame with one row per fold: the first and last date of every part and the
+      metrics returned by `evaluate_fold`.
+    - summary: pd.DataFrame with the mean, standard deviation, minimum and maximum of every metric across folds.
+    """
+    tasks = [
+        (evaluate_fold, _shareable(split.values), split.dates, split.tickers, split.boundaries, threads_per_worker)
+        for split in splits
+    ]
+    metrics = process_map(_fold_task, tasks, max_workers=max_workers, threads_per_worker=threads_per_worker,
+                          start_method=start_method)
+
+    rows = []
+    for split, fold_metrics in zip(splits, metrics):
+        row = {}
+        for name in SPLIT_NAMES:
+            index = split.index(name)
+            row[f'{name} start'] = index[0]
+            row[f'{name} end'] = index[-1]
+        row.update(fold_metrics)
+        rows.append(row)
+    fold_results = pd.DataFrame(rows)
+    fold_results.index.name = 'Fold'
+
+    metric_columns = list(dict.fromkeys(name for fold_metrics in metrics for name in fold_metrics))
+    summary = fold_results[metric_columns].agg(['mean', 'std', 'min', 'max']).T
+    return fold_results, summary
+
+
+def train_graph_model(model, train_data, validation_data, lr: float = 0.001, num_epochs: int = 50):
+    """
+    Train a model with the notebooks' loop: Adam on the one-step-ahead MSE, `out[:-1]` against `x[1:]`.
+
+    Returns:
+    - (train_loss_values, validation_loss_values), the loss of every epoch.
+    """
+    import torch
+
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    criterion = torch.nn.MSELoss()
+
+    train_loss_values = []
+    validation_loss_values = []
+    for _ in range(num_epochs):
+        model.train()
+        optimizer.zero_grad()
+        out = model(train_data)
+        loss = criterion(out[:-1], train_data.x[1:])
+        loss.backward()
+        optimizer.step()
+        train_loss_values.append(loss.item())
+
+        model.eval()
+        with torch.no_grad():
+            validation_out = model(validation_data)
+            validation_loss_values.append(criterion(validation_out[:-1], validation_data.x[1:]).item())
+
+    return train_loss_values, validation_loss_values